@@ -1,5 +1,4 @@
 import os
-import subprocess
 import librosa
 import numpy as np
 import soundfile as sf
@@ -9,9 +8,12 @@ import time
 import sys
 import traceback
 import torch
+from scipy.io import wavfile
 
 # === KONFIGURATION ===
-input_dir = "/proj/main_API/output"
+main_api_root = "/proj/main_API"
+ledger_path = os.getenv("MUREKA_LEDGER", os.path.join(main_api_root, "jobs.sqlite3"))  # wie ledger.LEDGER_PATH
+queue_wait = 0.5  # Sekunden zwischen Blicken in die leere Warteschlange
 rvc_model_path = "D_test_55.pth"
 demucs_model = "htdemucs"
 demucs_output_dir = "/proj/separated"
@@ -20,7 +22,6 @@ webui_root = "/proj/Retrieval-based-Voice-Conversion-WebUI"
 use_gpu = True
 
 print("🔧 Konfiguration geladen:")
-print(f"   Input Dir: {input_dir}")
 print(f"   RVC Model: {rvc_model_path}")
 print(f"   Demucs Model: {demucs_model}")
 print(f"   Output Dir: {final_output_dir}")
@@ -35,45 +36,138 @@ if not os.path.exists(init_path):
         f.write("")
     print(f"📄 Erstellt: {init_path}")
 
-def run_command(cmd, cwd=None, description=""):
-    print(f"\n🚀 Starte: {description or 'Kommando'}")
-    print("📄 Befehl:", " ".join(cmd))
-    if cwd:
-        print(f"📂 Arbeitsverzeichnis: {cwd}")
-    
-    start_time = time.time()
-    try:
-        result = subprocess.run(
-            cmd, cwd=cwd, capture_output=True, text=True, check=True, timeout=300
+# === RESIDENTE MODELLE ===
+# HTDemucs und der RVC-Stack (HuBERT, Synthesizer, RMVPE) werden einmal pro
+# Worker geladen und bleiben im Speicher. Früher startete jeder Song drei
+# Subprozesse (2× demucs, infer_cli.py), die torch/fairseq und alle Gewichte
+# jedes Mal neu laden mussten – und nach 300 s abgebrochen wurden.
+class ResidentModels:
+    """Demucs and RVC models shared by all songs this worker processes."""
+
+    def __init__(self):
+        self.device = "cuda:0" if use_gpu and torch.cuda.is_available() else "cpu"
+        self._demucs = None
+        self._vc = None
+
+    def demucs(self):
+        if self._demucs is None:
+            from demucs.pretrained import get_model
+            print(f"📦 Lade Demucs-Modell {demucs_model} ...")
+            model = get_model(demucs_model)
+            model.cpu()
+            model.eval()
+            self._demucs = model
+        return self._demucs
+
+    def vc(self):
+        if self._vc is None:
+            # Config, Gewichte, HuBERT und RMVPE werden relativ zum WebUI-Verzeichnis gefunden
+            os.chdir(webui_root)
+            if webui_root not in sys.path:
+                sys.path.insert(0, webui_root)
+            from dotenv import load_dotenv
+            from configs.config import Config
+            from infer.modules.vc.modules import VC
+            from infer.modules.vc.utils import load_hubert
+            print(f"📦 Lade RVC-Modell {os.path.basename(rvc_model_path)} ...")
+            load_dotenv()
+            config = Config()
+            config.device = self.device
+            # Wie bisher über infer_cli.py in half precision ("--is_half False" wurde per
+            # type=bool zu True). Hat Config() auf fp32 entschieden, auch die Puffer
+            # auf die half-Werte aus Config.device_config() setzen, damit beides passt.
+            if not config.is_half:
+                config.is_half = True
+                if config.gpu_mem is None or config.gpu_mem > 4:
+                    config.x_pad, config.x_query, config.x_center, config.x_max = 3, 10, 60, 65
+            vc = VC(config)
+            vc.get_vc(os.path.basename(rvc_model_path))
+            vc.hubert_model = load_hubert(config)
+            self._vc = vc
+        return self._vc
+
+    def load(self):
+        start_time = time.time()
+        self.demucs()
+        self.vc()
+        print(f"✅ Modelle geladen in {time.time() - start_time:.1f}s (Device: {self.device})")
+
+    def separate(self, input_wav):
+        """One Demucs pass as the CLI does it; returns the stems (vocals, bass, …) by name."""
+        from demucs.apply import apply_model
+        from demucs.audio import AudioFile
+        model = self.demucs()
+        wav = AudioFile(input_wav).read(streams=0, samplerate=model.samplerate, channels=model.audio_channels)
+        ref = wav.mean(0)
+        wav = (wav - ref.mean()) / ref.std()
+        with torch.no_grad():
+            sources = apply_model(
+                model, wav[None], device=self.device, shifts=1, split=True, overlap=0.25, progress=False
+            )[0]
+        sources = sources * ref.std() + ref.mean()
+        return dict(zip(model.sources, sources))
+
+    def save_stems(self, track_dir, **stems):
+        """Write stems as ``<track_dir>/<name>.wav`` (same format as the demucs CLI)."""
+        from demucs.audio import save_audio
+        os.makedirs(track_dir, exist_ok=True)
+        for name, source in stems.items():
+            save_audio(source.cpu(), os.path.join(track_dir, f"{name}.wav"), samplerate=self.demucs().samplerate)
+
+    def convert(self, input_path, output_path):
+        """Same call as tools/infer_cli.py (rmvpe, index rate 0.66, protect 0.33)."""
+        info, (sample_rate, audio) = self.vc().vc_single(
+            0, input_path, 0, None, "rmvpe", None, None, 0.66, 3, 0, 1, 0.33
         )
-        elapsed = time.time() - start_time
-        print(f"✅ Erfolg in {elapsed:.1f}s:", result.stdout.strip() or "Keine Ausgabe.")
-        if result.stderr:
-            print("⚠️ STDERR:\n", result.stderr.strip())
-    except subprocess.TimeoutExpired:
-        print(f"⏰ Zeitüberschreitung bei: {description}")
-        sys.exit(1)
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Fehler bei {description}")
-        print("📤 STDOUT:\n", e.stdout)
-        print("⚠️ STDERR:\n", e.stderr)
-        sys.exit(1)
-
-def process_file(latest_file):
+        if audio is None:
+            raise RuntimeError(f"RVC fehlgeschlagen: {info}")
+        wavfile.write(output_path, sample_rate, audio)
+
+
+def run_step(step, description):
+    print(f"\n🚀 Starte: {description}")
+    start_time = time.time()
+    result = step()
+    print(f"✅ Erfolg in {time.time() - start_time:.1f}s")
+    return result
+
+def process_file(input_path):
+    """Clone the vocals of one downloaded song; returns None or the error message."""
     try:
         print(f"\n{'='*60}")
-        print(f"🎬 STARTE VERARBEITUNG: {latest_file}")
+        print(f"🎬 STARTE VERARBEITUNG: {os.path.basename(input_path)}")
         print(f"{'='*60}")
         
-        input_path = os.path.join(input_dir, latest_file)
-        base_name = os.path.splitext(os.path.basename(latest_file))[0]
-        temp_wav_path = os.path.join(input_dir, base_name + "_converted.wav")
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        temp_wav_path = os.path.join(os.path.dirname(input_path), base_name + "_converted.wav")
         
         print(f"📄 Input Pfad: {input_path}")
         print(f"🏷️ Base Name: {base_name}")
 
+        # Pfade für Vocals-Separation
+        vocals_output_dir = os.path.join(demucs_output_dir, "vocals_only")
+        if base_name.endswith("_converted"):
+            sep_dir_vocals = os.path.join(vocals_output_dir, demucs_model, base_name)
+        else:
+            sep_dir_vocals = os.path.join(vocals_output_dir, demucs_model, base_name + "_converted")
+
+        # bass/drums/other für den Remix (Schritt 6)
+        full_output_dir = os.path.join(demucs_output_dir, "full_stems")
+        sep_dir_full = os.path.join(full_output_dir, demucs_model, os.path.basename(sep_dir_vocals))
+
+        vocals_path = os.path.join(sep_dir_vocals, "vocals.wav")
+        no_vocals_path = os.path.join(sep_dir_vocals, "no_vocals.wav")
+        converted_vocals_path = os.path.join(sep_dir_vocals, "vocals_rvc.wav")
+
+        # API.py legt bei MUREKA_FETCH_STEMS=1 die Stems von Mureka hier ab
+        provider_stems = os.path.exists(vocals_path) and os.path.exists(no_vocals_path)
+        if provider_stems:
+            print("🎁 Mureka-Stems vorhanden – überspringe Demucs (Schritte 1, 2 und 4)")
+
         # === SCHRITT 1: MP3 zu WAV Konversion ===
-        if latest_file.lower().endswith(".mp3"):
+        if provider_stems:
+            input_wav = None
+        elif input_path.lower().endswith(".mp3"):
             print(f"\n📍 SCHRITT 1: MP3 zu WAV Konversion")
             print("🔄 Konvertiere MP3 zu WAV...")
             audio = AudioSegment.from_mp3(input_path)
@@ -85,28 +179,19 @@ def process_file(latest_file):
             input_wav = input_path
             print(f"✅ Verwende direkt: {input_wav}")
 
-        # === SCHRITT 2: Erste Demucs-Separation (Vocals) ===
-        print(f"\n📍 SCHRITT 2: Demucs Vocals Separation")
-        vocals_output_dir = os.path.join(demucs_output_dir, "vocals_only")
-        print(f"📁 Vocals Output Dir: {vocals_output_dir}")
-        
-        demucs_vocals_cmd = [
-            "demucs",
-            "--two-stems=vocals",
-            "-n", demucs_model,
-            "-o", vocals_output_dir,
-            input_wav
-        ]
-        run_command(demucs_vocals_cmd, description="Demucs Vocals Separation")
-
-        # Pfade für Vocals-Separation
-        if base_name.endswith("_converted"):
-            sep_dir_vocals = os.path.join(vocals_output_dir, demucs_model, base_name)
-        else:
-            sep_dir_vocals = os.path.join(vocals_output_dir, demucs_model, base_name + "_converted")
-
-        vocals_path = os.path.join(sep_dir_vocals, "vocals.wav")
-        converted_vocals_path = os.path.join(sep_dir_vocals, "vocals_rvc.wav")
+        # === SCHRITT 2: Demucs-Separation (ein Durchlauf für RVC und Remix) ===
+        if not provider_stems:
+            print("\n📍 SCHRITT 2: Demucs Separation (alle Stems)")
+            print(f"📁 Vocals Output Dir: {vocals_output_dir}")
+            print(f"📁 Full Stems Output Dir: {full_output_dir}")
+            
+            step_start = time.time()
+            stems = run_step(lambda: models.separate(input_wav), "Demucs Separation")
+            instrumental = {name: source for name, source in stems.items() if name != "vocals"}
+            # Layout des Stems-Tabs: vocals.wav + no_vocals.wav (= bass + drums + other)
+            models.save_stems(sep_dir_vocals, vocals=stems["vocals"], no_vocals=sum(instrumental.values()))
+            models.save_stems(sep_dir_full, **instrumental)
+            ledger.record_stage("stems", DONE, time.time() - step_start)
         
         print(f"📁 Vocals Verzeichnis: {sep_dir_vocals}")
         print(f"🎤 Original Vocals: {vocals_path}")
@@ -120,62 +205,46 @@ def process_file(latest_file):
 
         # === SCHRITT 3: RVC Voice Cloning ===
         print(f"\n📍 SCHRITT 3: RVC Voice Cloning")
-        use_gpu = torch.cuda.is_available()
-        device_flag = "cuda:0" if use_gpu else "cpu"
-        print(f"🔧 GPU verfügbar: {use_gpu}")
-        print(f"🔧 Device: {device_flag}")
+        print(f"🔧 Device: {models.device}")
         print(f"🎭 Model: {os.path.basename(rvc_model_path)}")
         
-        rvc_cmd = [
-            "python3",
-            "tools/infer_cli.py",
-            "--model_name", os.path.basename(rvc_model_path),
-            "--input_path", vocals_path,
-            "--opt_path", converted_vocals_path,
-            "--f0method", "rmvpe",
-            "--device", device_flag,
-            "--is_half", "False"
-        ]
-        run_command(rvc_cmd, cwd=webui_root, description="RVC Voice Cloning")
+        step_start = time.time()
+        try:
+            run_step(lambda: models.convert(vocals_path, converted_vocals_path), "RVC Voice Cloning")
+        except Exception:
+            ledger.record_stage("voiceclone", FAILED, time.time() - step_start)
+            raise
 
         if not os.path.exists(converted_vocals_path):
-            print("❌ vocals_rvc.wav wurde nicht erzeugt!")
-            sys.exit(1)
+            ledger.record_stage("voiceclone", FAILED, time.time() - step_start)
+            raise RuntimeError("vocals_rvc.wav wurde nicht erzeugt")
+        ledger.record_stage("voiceclone", DONE, time.time() - step_start)
         
         cloned_size = os.path.getsize(converted_vocals_path) / (1024 * 1024)
         print(f"✅ Geklonte Vocals erstellt ({cloned_size:.1f} MB)")
 
-        # === SCHRITT 4: Vollständige Demucs-Separation ===
-        print(f"\n📍 SCHRITT 4: Demucs Full Separation (alle Stems)")
-        full_output_dir = os.path.join(demucs_output_dir, "full_stems")
-        print(f"📁 Full Stems Output Dir: {full_output_dir}")
-        
-        demucs_full_cmd = [
-            "demucs",
-            "-n", demucs_model,
-            "-o", full_output_dir,
-            input_wav
-        ]
-        run_command(demucs_full_cmd, description="Demucs Full Separation")
-
-        # Pfade für Full-Separation
-        if base_name.endswith("_converted"):
-            sep_dir_full = os.path.join(full_output_dir, demucs_model, base_name)
+        # === SCHRITT 4: Stems für den Remix ===
+        if provider_stems:
+            # Instrumental-Stem von Mureka ersetzt bass/drums/other
+            stem_files = {
+                "vocals": converted_vocals_path,  # Use cloned vocals
+                "no_vocals": no_vocals_path
+            }
         else:
-            sep_dir_full = os.path.join(full_output_dir, demucs_model, base_name + "_converted")
-
-        print(f"📁 Full Stems Verzeichnis: {sep_dir_full}")
+            # Schon in Schritt 2 mit separiert – kein zweiter Demucs-Lauf
+            print("\n📍 SCHRITT 4: Stems aus Schritt 2")
+            print(f"📁 Full Stems Verzeichnis: {sep_dir_full}")
+            stem_files = {
+                "vocals": converted_vocals_path,  # Use cloned vocals
+                "bass": os.path.join(sep_dir_full, "bass.wav"),
+                "drums": os.path.join(sep_dir_full, "drums.wav"),
+                "other": os.path.join(sep_dir_full, "other.wav")
+            }
 
         # === SCHRITT 5: Stem-Suche und Validierung ===
         print(f"\n📍 SCHRITT 5: Stem-Suche und Validierung")
-        stem_files = {
-            "vocals": converted_vocals_path,  # Use cloned vocals
-            "bass": os.path.join(sep_dir_full, "bass.wav"),
-            "drums": os.path.join(sep_dir_full, "drums.wav"),
-            "other": os.path.join(sep_dir_full, "other.wav")
-        }
         
-        print(f"🔍 Suche nach 4 Stems:")
+        print(f"🔍 Suche nach {len(stem_files)} Stems:")
         available_stems = {}
         total_size = 0
         for name, path in stem_files.items():
@@ -187,11 +256,10 @@ def process_file(latest_file):
             else:
                 print(f"  ❌ {name}: {path} (nicht gefunden)")
         
-        print(f"📊 Gefundene Stems: {len(available_stems)}/4 (Total: {total_size:.1f} MB)")
+        print(f"📊 Gefundene Stems: {len(available_stems)}/{len(stem_files)} (Total: {total_size:.1f} MB)")
         
         if len(available_stems) < 2:
-            print(f"❌ Zu wenige Stems gefunden! Brauche mindestens 2, habe {len(available_stems)}")
-            sys.exit(1)
+            raise RuntimeError(f"Zu wenige Stems gefunden! Brauche mindestens 2, habe {len(available_stems)}")
 
         # === SCHRITT 6: Audio-Kombination ===
         print(f"\n📍 SCHRITT 6: Audio-Kombination")
@@ -300,8 +368,7 @@ def process_file(latest_file):
         if success:
             print(f"🎼 WAV-Datei gespeichert: {output_wav_path}")
         else:
-            print("❌ Fehler beim Kombinieren der Stems!")
-            sys.exit(1)
+            raise RuntimeError("Fehler beim Kombinieren der Stems")
 
         # === SCHRITT 7: MP3 Export ===
         print(f"\n📍 SCHRITT 7: MP3 Export")
@@ -315,6 +382,11 @@ def process_file(latest_file):
         mp3_size = os.path.getsize(mp3_path) / (1024 * 1024)
         print(f"✅ MP3 exportiert: {mp3_path} ({mp3_size:.1f} MB)")
 
+        # Vorschau, Wellenform und Pegel für die Streamlit-Tabs
+        for preview_source in (mp3_path, converted_vocals_path, no_vocals_path):
+            if os.path.exists(preview_source) and ensure_preview(preview_source):
+                print(f"🖼️ Vorschau erstellt: {os.path.basename(preview_source)}")
+
         # === SCHRITT 8: Aufräumen ===
         print(f"\n📍 SCHRITT 8: Aufräumen")
         cleanup_count = 0
@@ -334,6 +406,7 @@ def process_file(latest_file):
         print(f"\n🎉 VERARBEITUNG ERFOLGREICH ABGESCHLOSSEN!")
         print(f"📁 Finales Ergebnis: {mp3_path}")
         print(f"{'='*60}")
+        return None
 
     except Exception as e:
         print(f"\n💥 FEHLER in process_file:")
@@ -341,29 +414,34 @@ def process_file(latest_file):
         print(f"📍 Traceback:")
         traceback.print_exc()
         print(f"{'='*60}")
+        return str(e)
 
-print(f"🕵️‍♂️ Starte Überwachung von: {input_dir}")
-print(f"⏱️ Überprüfung alle 3 Sekunden...")
+# API.py trägt jeden fertigen Download zusammen mit dem Umbenennen in die
+# Warteschlange des Job-Ledgers ein – kein Ordner-Scan, keine halben Dateien.
+sys.path.insert(0, main_api_root)
+from ledger import DONE, FAILED, JobLedger  # noqa: E402
+from previews import ensure_preview  # noqa: E402
 
-already_seen = set(os.listdir(input_dir))
-print(f"📋 Bereits vorhandene Dateien: {len(already_seen)}")
+ledger = JobLedger(ledger_path)
+models = ResidentModels()
+models.load()
+requeued = ledger.requeue_handoffs()
+print(f"🕵️‍♂️ Warte auf fertige Downloads aus: {ledger_path}")
+if requeued:
+    print(f"♻️ {requeued} unterbrochene Dateien wieder eingereiht")
 
 while True:
-    current_files = set(os.listdir(input_dir))
-    new_files = [
-        f for f in current_files - already_seen
-        if f.lower().endswith((".mp3", ".wav"))
-    ]
-    
-    if new_files:
-        print(f"\n🔔 {len(new_files)} neue Dateien erkannt!")
-        
-    for new_file in sorted(new_files):
-        print(f"\n🎵 Neue Datei erkannt: {new_file}")
-        process_time = time.time()
-        process_file(new_file)
-        elapsed = time.time() - process_time
-        print(f"⏱️ Gesamte Verarbeitungszeit: {elapsed:.1f} Sekunden")
-        
-    already_seen = current_files
-    time.sleep(3)
\ No newline at end of file
+    handoff = ledger.claim_handoff()
+    if handoff is None:
+        time.sleep(queue_wait)
+        continue
+
+    print(f"\n🎵 Neue Datei bereit: {os.path.basename(handoff['path'])} (Task {handoff['task_id']})")
+    process_time = time.time()
+    ledger.record_stage("handoff_wait", DONE, process_time - handoff["created_at"])
+    # Fehler beenden den Worker nicht mehr – die geladenen Modelle bleiben für den nächsten Song
+    # Der eingetragene Pfad gilt, auch wenn API.py in ein anderes Verzeichnis schreibt
+    error = process_file(handoff["path"])
+    ledger.finish_handoff(handoff["id"], FAILED if error else DONE, error)
+    elapsed = time.time() - process_time
+    print(f"⏱️ Gesamte Verarbeitungszeit: {elapsed:.1f} Sekunden")
\ No newline at end of file
@@ -4,38 +4,66 @@
 
 from __future__ import annotations
 
+import asyncio
+import base64
+import concurrent.futures
+import contextlib
+import hashlib
+import heapq
 import json
 import itertools
 import os
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
 import sys
+import threading
 import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, ContextManager, Dict, List, Union
 import logging
 import requests
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+import transport
+from job_index import IndexEntry, JsonIndex, first_record
+from log_setup import bind_log_context, clear_log_context, setup_logging
+from ledger import ACTIVE_STATES, CANCELLED, DONE, DOWNLOADING, FAILED, POLLING, get_ledger
+from metrics import JobTiming, record_job
+from previews import ensure_preview
+from search_index import get_search_index
+from storage import ACTIVE, ANFRAGEN, INBOX_DIR, STORE_DIR, customer_of, ingest, partition
 
-# Configure logging
-logging.basicConfig(
-    filename='streamlit_log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 # ──────────────────────────────────────────────────────────────
 # Konstante Konfiguration
 # ──────────────────────────────────────────────────────────────
-BASE: str = "https://api.mureka.ai/v1"
+BASE: str = os.getenv("MUREKA_BASE_URL", "https://api.mureka.ai/v1")
 API_KEY: str = os.getenv("MUREKA_API_KEY", "op_ma3twdh4M5gm7iiN819wpZ3TrRxvvA8")
 HEADERS: Dict[str, str] = {
     "Authorization": f"Bearer {API_KEY}",
     "Content-Type": "application/json",
 }
-FILES_DIR: Path = Path("./files")
+FILES_DIR: Path = INBOX_DIR  # Eingang (wie main.py); Jobs liegen danach in storage.STORE_DIR
 OUT_DIR: Path = Path("./output")
 POLL_EVERY: int = 3  # Sekunden zwischen Status‑Abfragen
-TIMEOUT: int = 120
+POLL_MAX_INTERVAL: float = 8.0  # obere Grenze für den Backoff einer Task
+POLL_BACKOFF: float = 1.5
+POLL_HEADSTART: float = 0.5  # Anteil der mittleren Laufzeit (Median), vor dem nie gepollt wird
+DOWNLOAD_CHUNK: int = 256 * 1024
+DOWNLOAD_RETRIES: int = 5
+MAX_CONCURRENT_JOBS: int = int(os.getenv("MUREKA_MAX_CONCURRENT_JOBS", "5"))
+RESCAN_EVERY: int = 300  # Sekunden zwischen Sicherheits-Scans des Ordners
+PENDING_STATUS: str = "An Mureka weitergegeben"
+DONE_STATES: set[str] = {"succeeded", "finished"}
+FAILED_STATES: set[str] = {"failed", "rejected", "timeouted", "cancelled"}
 URL_KEYS: set[str] = {
     "audio_url",
     "url",
@@ -45,6 +73,15 @@ URL_KEYS: set[str] = {
     "download_url",
 }
 
+# Stems von Mureka statt lokaler Demucs-Trennung (voiceclone.py erkennt sie
+# im Ordner <Song>_converted und startet direkt mit RVC).
+FETCH_STEMS: bool = os.getenv("MUREKA_FETCH_STEMS", "0") == "1"
+STEMS_DIR: Path = Path(os.getenv("MUREKA_STEMS_DIR", "/proj/separated/vocals_only/htdemucs"))
+STEM_TYPES: Dict[str, str] = {  # lokaler Dateiname → "type" bei /song/stem
+    "vocals": "vocal",
+    "no_vocals": "instrumental",
+}
+
 # Falls Upload‑IDs gebraucht werden: hier eintragen.
 UPLOAD_IDS: List[str] = []
 
@@ -62,10 +99,13 @@ def die(msg: str) -> None:  # noqa: D401 – kurz & knackig
     sys.exit(1)
 
 
-def post(route: str, body: Dict[str, Any]) -> Dict[str, Any]:
+def post(
+    route: str, body: Dict[str, Any], idempotent: bool = False, token_taken: bool = False
+) -> Dict[str, Any]:
     logger.info(f"Making POST request to {route}")
-    resp = requests.post(
-        f"{BASE}{route}", headers=HEADERS, json=body, timeout=TIMEOUT
+    resp = transport.post(
+        f"{BASE}{route}", route=route, idempotent=idempotent, token_taken=token_taken,
+        headers=HEADERS, json=body,
     )
     if resp.status_code != 200:
         error_msg = f"{route} → {resp.status_code}: {resp.text[:200]}…"
@@ -77,13 +117,13 @@ def post(route: str, body: Dict[str, Any]) -> Dict[str, Any]:
 
 def complete_upload(uid: str) -> None:
     logger.info(f"Completing upload {uid}")
-    post("/uploads/complete", {"upload_id": uid})
+    post("/uploads/complete", {"upload_id": uid}, idempotent=True)
     logger.info(f"Successfully completed upload {uid}")
 
 
-def generate(payload: Dict[str, Any]) -> str:
+def generate(payload: Dict[str, Any], token_taken: bool = False) -> str:
     logger.info("Generating song with payload")
-    data = post("/song/generate", payload)
+    data = post("/song/generate", payload, token_taken=token_taken)
     tid = data.get("title") or data.get("task_id") or data.get("id")
     if not tid:
         error_msg = f"Keine task_id in Antwort: {data}"
@@ -93,34 +133,198 @@ def generate(payload: Dict[str, Any]) -> str:
     return tid
 
 
+async def generate_async(payload: Dict[str, Any]) -> str:
+    """``generate`` that waits for its rate-limit token on the event loop.
+
+    Otherwise many parallel submits (e.g. 20 variants) would each block a
+    thread of the default executor inside ``TokenBucket.acquire`` and starve
+    the status polls and downloads of all other jobs.
+    """
+    bucket = transport.bucket_for("/song/generate")
+    if bucket is not None:
+        waited = await bucket.acquire_async()
+        if waited > 1:
+            logger.info(f"Rate limit: POST /song/generate waited {waited:.1f}s for a token")
+    return await asyncio.to_thread(generate, payload, bucket is not None)
+
+
+def query_status(tid: str) -> Dict[str, Any]:
+    resp = transport.get(f"{BASE}/song/query/{tid}", route="/song/query", headers=HEADERS)
+    if resp.status_code != 200:
+        error_msg = f"Polling‑Fehler {resp.status_code}: {resp.text[:120]}…"
+        logger.error(error_msg)
+        raise RuntimeError(error_msg)
+    return resp.json()
+
+
+def check_status(tid: str, data: Dict[str, Any]) -> bool:
+    """Return True once the task is done, raise if Mureka gave up on it."""
+    status = data.get("status")
+    if status in DONE_STATES:
+        logger.info(f"Task {tid} completed successfully")
+        return True
+    if status in FAILED_STATES:
+        error_msg = f"Job abgebrochen: {status}"
+        logger.error(error_msg)
+        raise RuntimeError(error_msg)
+    logger.debug(f"Task {tid} status: {status}")
+    return False
+
+
 def poll_status(tid: str) -> Dict[str, Any]:
-    url = f"{BASE}/song/query/{tid}"
     spinner = itertools.cycle("⠋⠙⠹⠸⠼⠴⠦⠧")
     logger.info(f"Starting to poll status for task {tid}")
     
     while True:
-        resp = requests.get(url, headers=HEADERS, timeout=TIMEOUT)
-        if resp.status_code != 200:
-            error_msg = f"Polling‑Fehler {resp.status_code}: {resp.text[:120]}…"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
-            
-        data: Dict[str, Any] = resp.json()
-        status = data.get("status")
-        
-        if status in {"succeeded", "finished"}:
-            logger.info(f"Task {tid} completed successfully")
+        data = query_status(tid)
+        if check_status(tid, data):
             return data
-        if status in {"failed", "rejected", "timeouted", "cancelled"}:
-            error_msg = f"Job abgebrochen: {status}"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
-            
-        logger.debug(f"Task {tid} status: {status}")
-        print(f"\r{next(spinner)}  {status:<9}", end="", flush=True)
+        print(f"\r{next(spinner)}  {data.get('status'):<9}", end="", flush=True)
         time.sleep(POLL_EVERY)
 
 
+# Treffer/Fehlschläge des Payload-Caches seit Prozessstart
+CACHE_STATS: Dict[str, int] = {"hit": 0, "miss": 0}
+
+# Beobachtete Generierungsdauern (Sekunden) – Grundlage für die Poll-Planung.
+_OBSERVED_DURATIONS: deque[float] = deque(maxlen=50)
+
+
+@dataclass
+class _TrackedTask:
+    future: asyncio.Future
+    submitted_at: float
+    next_poll_at: float
+    interval: float = 0.0
+    polls: int = 0
+    timing: JobTiming | None = None
+
+
+class StatusPoller:
+    """One loop that owns every in-flight task ID of an event loop.
+
+    Instead of a ``poll_status`` loop per task, tasks register here and the
+    poller only queries the ones that are due. A task is first polled after
+    ``POLL_HEADSTART`` of the median generation time seen so far (a single
+    short jingle does not move it); after that the interval grows
+    exponentially up to ``POLL_MAX_INTERVAL`` so detection stays within a few
+    seconds.
+    """
+
+    def __init__(
+        self,
+        min_interval: float | None = None,
+        max_interval: float | None = None,
+        backoff: float | None = None,
+    ) -> None:
+        self.min_interval = POLL_EVERY if min_interval is None else min_interval
+        self.max_interval = POLL_MAX_INTERVAL if max_interval is None else max_interval
+        self.backoff = POLL_BACKOFF if backoff is None else backoff
+        self.requests = 0
+        self._tasks: Dict[str, _TrackedTask] = {}
+        self._wakeup = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+
+    @staticmethod
+    def earliest_done() -> float:
+        """Seconds after submission before a task can plausibly be finished."""
+        if not _OBSERVED_DURATIONS:
+            return 0.0
+        return statistics.median(_OBSERVED_DURATIONS) * POLL_HEADSTART
+
+    async def wait(
+        self,
+        tid: str,
+        submitted_at: float | None = None,
+        timing: JobTiming | None = None,
+    ) -> Dict[str, Any]:
+        """Register ``tid`` and wait until Mureka reports it as done.
+
+        If ``timing`` is given, poll count, time to first "running" and total
+        poll time are recorded on it.
+        """
+        now = time.monotonic()
+        submitted_at = submitted_at or now
+        tracked = _TrackedTask(
+            future=asyncio.get_running_loop().create_future(),
+            submitted_at=submitted_at,
+            next_poll_at=max(now, submitted_at + self.earliest_done(), now + self.min_interval),
+            interval=self.min_interval,
+            timing=timing,
+        )
+        self._tasks[tid] = tracked
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        self._wakeup.set()
+        try:
+            return await tracked.future
+        finally:
+            self._tasks.pop(tid, None)
+
+    def discard(self, tid: str) -> None:
+        """Stop polling ``tid``; whoever waits on it gets a CancelledError."""
+        tracked = self._tasks.pop(tid, None)
+        if tracked and not tracked.future.done():
+            tracked.future.cancel()
+
+    async def _poll(self, tid: str, tracked: _TrackedTask) -> None:
+        self.requests += 1
+        tracked.polls += 1
+        timing = tracked.timing
+        if timing is not None:
+            timing.polls = tracked.polls
+        try:
+            data = await asyncio.to_thread(query_status, tid)
+            elapsed = time.monotonic() - tracked.submitted_at
+            if timing is not None and timing.first_running_s is None and data.get("status") == "running":
+                timing.first_running_s = elapsed
+            if check_status(tid, data):
+                duration = elapsed
+                if timing is not None:
+                    timing.poll_s = duration
+                _OBSERVED_DURATIONS.append(duration)
+                logger.info(
+                    f"Task {tid} done after {duration:.1f}s and {tracked.polls} polls",
+                    extra={"task": tid, "poll_s": round(duration, 3), "polls": tracked.polls},
+                )
+                if not tracked.future.done():
+                    tracked.future.set_result(data)
+                return
+        except Exception as exc:
+            if not tracked.future.done():
+                tracked.future.set_exception(exc)
+            return
+        tracked.next_poll_at = time.monotonic() + tracked.interval
+        tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+
+    async def _run(self) -> None:
+        clear_log_context()  # gestartet vom ersten Job, pollt aber für alle
+        while self._tasks:
+            now = time.monotonic()
+            due = [(tid, t) for tid, t in list(self._tasks.items()) if t.next_poll_at <= now]
+            if due:
+                await asyncio.gather(*(self._poll(tid, t) for tid, t in due))
+                continue
+            self._wakeup.clear()
+            delay = min(t.next_poll_at for t in self._tasks.values()) - now
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+_POLLERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, StatusPoller]" = weakref.WeakKeyDictionary()
+
+
+def get_poller() -> StatusPoller:
+    """Return the poller of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    poller = _POLLERS.get(loop)
+    if poller is None:
+        poller = _POLLERS[loop] = StatusPoller()
+    return poller
+
+
 def find_url(obj: Union[Dict[str, Any], List[Any]]) -> str | None:
     if isinstance(obj, dict):
         for k, v in obj.items():
@@ -137,31 +341,124 @@ def find_url(obj: Union[Dict[str, Any], List[Any]]) -> str | None:
     return None
 
 
-def fallback_stem(song_id: str) -> str | None:
+def fallback_stem(song_id: str, stem_type: str = "master") -> str | None:
     try:
-        logger.info(f"Attempting to get fallback stem for song_id: {song_id}")
-        data = post("/song/stem", {"song_id": song_id, "type": "master"})
+        logger.info(f"Attempting to get {stem_type} stem for song_id: {song_id}")
+        data = post("/song/stem", {"song_id": song_id, "type": stem_type}, idempotent=True)
         url = find_url(data)
         if url:
-            logger.info(f"Successfully found fallback stem URL for song_id: {song_id}")
+            logger.info(f"Successfully found {stem_type} stem URL for song_id: {song_id}")
         else:
-            logger.warning(f"No fallback stem URL found for song_id: {song_id}")
+            logger.warning(f"No {stem_type} stem URL found for song_id: {song_id}")
         return url
     except Exception as exc:
-        logger.error(f"Failed to get fallback stem: {exc}")
+        logger.error(f"Failed to get {stem_type} stem: {exc}")
         return None
 
 
-def download(url: str, tid: str, original_data: dict) -> Path:
-    logger.info(f"Starting download for task {tid}")
-    resp = requests.get(url, timeout=TIMEOUT)
-    if resp.status_code != 200:
-        error_msg = f"Download‑Fehler {resp.status_code}: {resp.text[:120]}…"
-        logger.error(error_msg)
-        raise RuntimeError(error_msg)
-        
-    OUT_DIR.mkdir(exist_ok=True)
-    
+def _file_digests(path: Path) -> tuple:
+    """Hash an existing (partial) file in chunks, returning sha256 and md5 objects."""
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    if path.exists():
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+                sha256.update(chunk)
+                md5.update(chunk)
+    return sha256, md5
+
+
+def stream_download(
+    url: str,
+    dest: Path,
+    finalize: Callable[[], ContextManager[Any]] | None = None,
+) -> tuple:
+    """Stream ``url`` into ``dest`` in constant memory and return (bytes, sha256).
+
+    Data goes to ``<dest>.part`` first; an interrupted transfer is resumed with
+    an HTTP Range request. The file is only renamed to ``dest`` once its size
+    (and, if the server sends Content-MD5, its checksum) has been verified. On a
+    206 answer Content-MD5 only covers the returned range, so it is checked
+    against the appended bytes; the whole-file check uses the header of a 200.
+    ``finalize`` returns a context manager the rename runs in (e.g. the
+    voice-cloning handoff of the ledger).
+    """
+    part = dest.with_name(dest.name + ".part")
+    sha256, md5 = _file_digests(part)
+    expected_size: int | None = None
+    expected_md5: str | None = None
+    attempt = 0
+
+    while True:
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with transport.get(url, route="download", stream=True, headers=headers) as resp:
+                if resp.status_code == 416:
+                    # Teil-Datei ist schon vollständig – oder passt nicht mehr zur Quelle
+                    total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+                    if total.isdigit() and int(total) == offset:
+                        expected_size = offset
+                        break
+                    part.unlink()
+                    sha256, md5 = hashlib.sha256(), hashlib.md5()
+                    continue
+                if resp.status_code not in (200, 206):
+                    error_msg = f"Download‑Fehler {resp.status_code}: {resp.text[:120]}…"
+                    logger.error(error_msg)
+                    raise RuntimeError(error_msg)
+
+                range_md5 = None
+                if resp.status_code == 206:
+                    total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+                    expected_size = int(total) if total.isdigit() else None
+                    range_md5 = resp.headers.get("Content-MD5")
+                    mode = 'ab'
+                else:
+                    # Server ignoriert Range → von vorne beginnen
+                    length = resp.headers.get("Content-Length")
+                    expected_size = int(length) if length and length.isdigit() else None
+                    expected_md5 = resp.headers.get("Content-MD5")
+                    sha256, md5 = hashlib.sha256(), hashlib.md5()
+                    mode = 'wb'
+
+                appended = hashlib.md5()
+                with open(part, mode) as f:
+                    for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                        f.write(chunk)
+                        sha256.update(chunk)
+                        md5.update(chunk)
+                        appended.update(chunk)
+                if range_md5 and base64.b64encode(appended.digest()).decode() != range_md5:
+                    part.unlink()
+                    raise RuntimeError(f"Prüfsumme des fortgesetzten Teils stimmt nicht für {dest.name}")
+            break
+        except (
+            requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as exc:
+            attempt += 1
+            if attempt > DOWNLOAD_RETRIES:
+                raise RuntimeError(f"Download abgebrochen nach {attempt} Versuchen: {exc}") from exc
+            delay = transport.backoff_delay(attempt)
+            logger.warning(f"Download interrupted at {offset} bytes ({exc}), resuming in {delay:.1f}s")
+            time.sleep(delay)
+
+    size = part.stat().st_size
+    if expected_size is not None and size != expected_size:
+        part.unlink()
+        raise RuntimeError(f"Download unvollständig: {size} von {expected_size} Bytes")
+    if expected_md5 and base64.b64encode(md5.digest()).decode() != expected_md5:
+        part.unlink()
+        raise RuntimeError(f"Prüfsumme stimmt nicht für {dest.name}")
+
+    with finalize() if finalize else contextlib.nullcontext():
+        os.replace(part, dest)
+    return size, sha256.hexdigest()
+
+
+def song_path(tid: str, original_data: dict) -> Path:
+    """Target MP3 path in OUT_DIR, built from the title and the task ID."""
     # Get title from original data
     title = original_data.get("Titel", "")
     logger.debug(f"Original title: '{title}'")
@@ -185,25 +482,166 @@ def download(url: str, tid: str, original_data: dict) -> Path:
         logger.debug(f"Using final fallback title: '{title}'")
     
     # Combine title and task ID for filename
-    fn = OUT_DIR / f"{title}_{tid}.mp3"
-    fn.write_bytes(resp.content)
-    logger.info(f"Successfully downloaded and saved MP3 as {fn}")
+    return OUT_DIR / f"{title}_{tid}.mp3"
+
+
+def download(url: str, tid: str, original_data: dict) -> Path:
+    logger.info(f"Starting download for task {tid}")
+    OUT_DIR.mkdir(exist_ok=True)
+    fn = song_path(tid, original_data)
+    # voiceclone.py holt das MP3 aus der Warteschlange, sobald es umbenannt ist
+    size, sha256 = stream_download(url, fn, finalize=lambda: get_ledger().handoff(fn, tid))
+    logger.info(f"Successfully downloaded and saved MP3 as {fn} ({size} bytes, sha256 {sha256[:12]}…)")
     return fn
 
 
-def process_job(json_path: Union[str, Path], force_process: bool = False) -> None:
-    """Process a job from a JSON file.
-    
-    Args:
-        json_path: Path to the JSON file (can be string or Path object)
-        force_process: Whether to force processing even if status doesn't match
+def download_stem(song_id: str, name: str, stem_type: str, stem_dir: Path) -> Path:
+    """Fetch one provider stem and store it as ``<stem_dir>/<name>.wav``."""
+    url = fallback_stem(song_id, stem_type)
+    if not url:
+        raise RuntimeError(f"Kein {stem_type}-Stem für {song_id}")
+    target = stem_dir / f"{name}.wav"
+    suffix = Path(url.split("?", 1)[0]).suffix.lower() or ".mp3"
+    if suffix == ".wav":
+        stream_download(url, target)
+        return target
+
+    # Mureka liefert komprimiert – voiceclone.py und main.py erwarten WAV.
+    source = stem_dir / f"{name}{suffix}"
+    stream_download(url, source)
+    part = stem_dir / f"{name}.wav.part"
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", str(source), "-f", "wav", str(part)],
+            check=True,
+            capture_output=True,
+        )
+        os.replace(part, target)
+    finally:
+        source.unlink(missing_ok=True)
+        part.unlink(missing_ok=True)
+    return target
+
+
+async def fetch_stems(song_id: str, mp3_path: Path) -> Path | None:
+    """Store Mureka's vocal/instrumental stems where voiceclone.py looks for Demucs output.
+
+    The folder is ``STEMS_DIR/<mp3 name>_converted`` – the same one Demucs
+    would create for the converted WAV. Returns None (and leaves nothing
+    behind) if a stem is missing, so voiceclone.py falls back to Demucs.
     """
-    # Convert string path to Path object if necessary
-    if isinstance(json_path, str):
-        json_path = Path(json_path)
-    
-    logger.info(f"Processing job for file: {json_path}")
+    stem_dir = STEMS_DIR / f"{mp3_path.stem}_converted"
+    stem_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        await asyncio.gather(
+            *(
+                asyncio.to_thread(download_stem, song_id, name, stem_type, stem_dir)
+                for name, stem_type in STEM_TYPES.items()
+            )
+        )
+    except Exception as exc:
+        logger.warning(f"Stems for {song_id} not available, voiceclone will use Demucs: {exc}")
+        shutil.rmtree(stem_dir, ignore_errors=True)
+        return None
+    logger.info(f"Stored Mureka stems for {song_id} in {stem_dir}")
+    return stem_dir
 
+
+class PriorityLimiter:
+    """Like asyncio.Semaphore, but a freed slot goes to the lowest priority value."""
+
+    def __init__(self, slots: int) -> None:
+        self._free = slots
+        self._waiters: List[tuple] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+# Kurze Bestellungen überholen lange – Schlüssel ist der Anfang von "Songlaenge".
+SONGLAENGE_PRIORITY: Dict[str, int] = {
+    "Jingle": 0,
+    "Kompaktsong": 1,
+    "Markensong": 2,
+    "Unternehmenshymne": 3,
+    "Individueller": 4,
+}
+DEFAULT_PRIORITY: int = 2
+
+_request_indexes: Dict[str, JsonIndex] = {}  # Kunde → Index seiner aktiven Anfragen
+
+
+def request_created(path: str, request: Dict[str, Any]) -> str:
+    """Creation time of an Anfrage as sortable ``YYYY-MM-DD HH:MM:SS``, or "" if unknown.
+
+    Read from ``erstellungsdatum``, else from the file name
+    (``Anfr_<Firma>_<YYYYmmdd_HHMMSS>.json``). Unlike the file's ctime both
+    survive moves between storage partitions.
+    """
+    if request.get("erstellungsdatum"):
+        return str(request["erstellungsdatum"])
+    match = re.search(r"_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})\.json$", path)
+    if not match:
+        return ""
+    year, month, day, hour, minute, second = match.groups()
+    return f"{year}-{month}-{day} {hour}:{minute}:{second}"
+
+
+def job_priority(data: Dict[str, Any]) -> int:
+    """Priority of a job from its ``Songlaenge`` (lower runs first).
+
+    Songideen do not carry the field themselves, so it is taken from the
+    newest active Anfrage of the same Firma (only that customer's folder is read).
+    """
+    songlaenge = data.get("Songlaenge")
+    firma = (data.get("Firma") or "").strip().lower()
+    if not songlaenge and firma:
+        newest = ""
+        customer = customer_of(data)
+        index = _request_indexes.setdefault(customer, JsonIndex(partition(ACTIVE, ANFRAGEN) / customer))
+        for path, entry in index.scan().items():
+            request = first_record(entry.data)
+            created = request_created(path, request)
+            if (
+                (request.get("Firma") or "").strip().lower() == firma
+                and created >= newest
+            ):
+                newest, songlaenge = created, request.get("Songlaenge")
+    for prefix, priority in SONGLAENGE_PRIORITY.items():
+        if (songlaenge or "").startswith(prefix):
+            return priority
+    return DEFAULT_PRIORITY
+
+
+def load_job(json_path: Path) -> Dict[str, Any] | None:
+    """Read a job file; broken JSON is marked as ``fehler`` and yields None."""
     try:
         with open(json_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -212,81 +650,571 @@ def process_job(json_path: Union[str, Path], force_process: bool = False) -> Non
     except ValueError as exc:
         error_msg = f"Invalid JSON: {exc}"
         logger.error(error_msg)
-        data = {"Status": "fehler", "message": error_msg}
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump([data], f, ensure_ascii=False, indent=2)
-        return
+        write_job(json_path, {"Status": "fehler", "message": error_msg})
+        return None
+    return data
 
-    if data.get("Status") != "An Mureka weitergegeben" and not force_process:
-        logger.info(f"Skipping {json_path} (no pending job)")
-        return
 
+def write_job(json_path: Path, data: Dict[str, Any]) -> None:
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump([data], f, ensure_ascii=False, indent=2)
+    logger.info(f"Updated JSON file: {json_path}")
+    try:
+        get_search_index().update_file(json_path)
+    except sqlite3.Error as exc:
+        logger.warning(f"Search index not updated for {json_path}: {exc}")
+
+
+def payload_hash(payload: Dict[str, Any]) -> str:
+    """Hash a payload so that whitespace-only differences map to the same song."""
+    normalized = {
+        k: " ".join(v.split()) if isinstance(v, str) else v
+        for k, v in payload.items()
+    }
+    blob = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def build_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Create payload for Mureka API
+    return {
+        "lyrics": data.get("Lyrics", ""),
+        "model": "auto",
+        "prompt": data.get("Description", ""),
+        "title": data.get("Titel", ""),
+        #"genre": "pop",
+        #"temperature": 0.8
+    }
+
+
+async def fetch_song(
+    task: Dict[str, Any], task_id: str, data: Dict[str, Any], timing: JobTiming
+) -> Path:
+    """Find the MP3 URL of a finished task (or ask /song/stem) and download it.
+
+    With ``FETCH_STEMS`` the provider's vocal and instrumental stems are
+    stored first, see ``fetch_stems``. Afterwards the preview files for
+    main.py are written (see previews.py).
+    """
+    url = find_url(task) or await asyncio.to_thread(
+        fallback_stem, task.get("song_id") or task_id
+    )
+    if not url:
+        error_msg = "No download URL found"
+        logger.error(f"{error_msg} for task {task_id}", extra={"mureka_task": task})
+        raise RuntimeError(error_msg)
+
+    if FETCH_STEMS:
+        # Vor dem MP3 ablegen: voiceclone.py startet, sobald das MP3 auftaucht.
+        await fetch_stems(task.get("song_id") or task_id, song_path(task_id, data))
+
+    download_started = time.monotonic()
+    mp3_path = await asyncio.to_thread(download, url, task_id, data)
+    timing.download_s = time.monotonic() - download_started
+    timing.download_bytes = mp3_path.stat().st_size
+    logger.info(f"Successfully downloaded MP3 to {mp3_path}")
+    await asyncio.to_thread(ensure_preview, mp3_path)
+    return mp3_path
+
+
+async def _run_variant(
+    json_path: Path,
+    variant: int,
+    data: Dict[str, Any],
+    payload: Dict[str, Any],
+    previous: Dict[str, Any] | None = None,
+) -> tuple:
+    """Generate (or resume), poll and download one variant; returns (task_id, mp3_path)."""
+    ledger = get_ledger()
+    timing = JobTiming(job=f"{json_path.name}#{variant}")
+    bind_log_context(job=timing.job)
+    task_id = previous["task_id"] if previous else None
     try:
-        # Create payload for Mureka API
-        payload = {
-            "lyrics": data.get("Lyrics", ""),
-            "model": "auto",
-            "prompt": data.get("Description", ""),
-            "title": data.get("Titel", ""),
-            #"genre": "pop",
-            #"temperature": 0.8
-        }
-        logger.info(f"Created payload for task with title: {payload.get('title', 'No title')}")
-
-        # Handle optional uploads
-        for uid in UPLOAD_IDS:
-            complete_upload(uid)
-
-        task_id = generate(payload)
-        logger.info(f"Started task {task_id}")
-        task = poll_status(task_id)
-        logger.info("Task completed successfully")
-
-        url = find_url(task) or fallback_stem(task.get("song_id") or task_id)
-        if not url:
-            error_msg = "No download URL found"
-            logger.error(f"{error_msg} - Full task object: {json.dumps(task, indent=2, ensure_ascii=False)}")
-            raise RuntimeError(error_msg)
-
-        mp3_path = download(url, task_id, data)
-        logger.info(f"Successfully downloaded MP3 to {mp3_path}")
-
-        # Update data with new information
+        if task_id:
+            submitted_at = time.monotonic() - (time.time() - previous["created_at"])
+            logger.info(f"Resuming variant {variant} of {json_path.name} (task {task_id})")
+        else:
+            submitted_at = time.monotonic()
+            task_id = await generate_async(payload)
+            timing.generate_s = time.monotonic() - submitted_at
+            ledger.variant_submitted(json_path, variant, task_id)
+            logger.info(f"Started variant {variant} of {json_path.name} as task {task_id}")
+        bind_log_context(task=task_id)
+
+        ledger.set_variant_state(json_path, variant, POLLING)
+        task = await get_poller().wait(task_id, submitted_at, timing)
+        ledger.set_variant_state(json_path, variant, DOWNLOADING)
+        # Ein Download im Thread lässt sich nicht abbrechen und übergibt die Datei
+        # ans Voice-Cloning: fertig laden und die Variante behalten statt sie zu verlieren.
+        download = asyncio.ensure_future(fetch_song(task, task_id, data, timing))
+        try:
+            mp3_path = await asyncio.shield(download)
+        except asyncio.CancelledError:
+            if download.done() and download.cancelled():
+                raise
+            logger.info(f"Variant {variant} of {json_path.name} is already downloading, keeping it")
+            mp3_path = await download
+        ledger.set_variant_state(json_path, variant, DONE, output_path=str(mp3_path), message="OK")
+    except asyncio.CancelledError:
+        # Mureka kennt kein Abbrechen – die Task wird nur nicht mehr abgefragt.
+        logger.info(f"Variant {variant} of {json_path.name} no longer needed")
+        if task_id:
+            ledger.set_variant_state(json_path, variant, CANCELLED, message="Nicht mehr benötigt")
+        record_job(timing, "cancelled")
+        raise
+    except Exception as exc:
+        logger.error(f"Variant {variant} of {json_path.name} failed: {exc}")
+        if task_id:
+            ledger.set_variant_state(json_path, variant, FAILED, message=str(exc))
+        record_job(timing, "failed")
+        raise
+    record_job(timing, "done")
+    return task_id, mp3_path
+
+
+async def process_variants_async(
+    json_path: Union[str, Path],
+    count: int,
+    keep: int | None = None,
+    limiter: PriorityLimiter | None = None,
+) -> None:
+    """Generate ``count`` variants of one Songidee at the same time.
+
+    All generations are submitted together and each one is downloaded as soon
+    as it finishes, so the whole round costs one generation latency instead
+    of ``count``. Once ``keep`` variants are downloaded the remaining ones are
+    no longer polled; variants already downloading by then are finished and
+    listed as well. The variants are stored as siblings of the job in the
+    ledger; the JSON lists their MP3s under ``"variants"``. The job takes a
+    single limiter slot, the generate token bucket still paces the submits.
+
+    Args:
+        json_path: Path to the JSON file of the Songidee
+        count: Number of generations to start
+        keep: Stop after this many finished variants (default: all)
+        limiter: Shared limiter, see ``process_job_async``
+    """
+    json_path = Path(json_path)
+    data = load_job(json_path)
+    if data is None:
+        return
+    keep = min(keep or count, count)
+    ledger = get_ledger()
+    entry = ledger.get(json_path)
+    payload = build_payload(data)
+    digest = payload_hash(payload)
+    data.pop("force_new_variant", None)
+
+    previous: Dict[int, Dict[str, Any]] = {}
+    if entry and entry["state"] in ACTIVE_STATES and entry["payload_hash"] == digest:
+        previous = {v["variant"]: v for v in ledger.variants(json_path)}
+        logger.info(f"Resuming variant round for {json_path} ({len(previous)} variants known)")
+    else:
+        ledger.clear_variants(json_path)
+        ledger.submitted(json_path, None, digest)
+
+    finished: List[tuple] = [
+        (v["task_id"], Path(v["output_path"])) for v in previous.values() if v["state"] == DONE
+    ]
+    errors: List[str] = []
+
+    async with (limiter or PriorityLimiter(1)).slot(job_priority(data)):
+        ledger.set_state(json_path, POLLING)
+        runs: Dict[asyncio.Task, int] = {}
+        for variant in range(count if len(finished) < keep else 0):
+            known = previous.get(variant)
+            if known and known["state"] not in ACTIVE_STATES:
+                continue
+            runs[asyncio.create_task(_run_variant(json_path, variant, data, payload, known))] = variant
+        logger.info(f"Running {len(runs)} variants of {json_path.name}, keeping {keep}")
+
+        try:
+            for next_done in asyncio.as_completed(runs):
+                try:
+                    finished.append(await next_done)
+                except Exception as exc:
+                    errors.append(str(exc))
+                if len(finished) >= keep:
+                    break
+        finally:
+            for run in runs:
+                run.cancel()
+            outcomes = await asyncio.gather(*runs, return_exceptions=True)
+        finished += [outcome for outcome in outcomes if isinstance(outcome, tuple) and outcome not in finished]
+
+    data.pop("variant_count", None)
+    data.pop("variant_keep", None)
+    if finished:
+        task_id, mp3_path = finished[0]
+        message = f"OK ({len(finished)} von {count} Varianten)"
+        ledger.set_state(json_path, DONE, task_id=task_id, output_path=str(mp3_path), message=message)
         data.update(
             {
                 "Status": "fertig",
                 "task_id": task_id,
                 "output_path": str(mp3_path),
-                "message": "OK",
+                "variants": [str(path) for _, path in finished],
+                "message": message,
             }
         )
-        logger.info("Updated job data with success status")
-
-    except Exception as exc:
-        error_msg = str(exc)
-        logger.error(f"Error processing job: {error_msg}")
+    else:
+        error_msg = "; ".join(errors) or "Keine Variante fertig"
+        ledger.set_state(json_path, FAILED, message=error_msg)
         data.update({"Status": "fehler", "message": error_msg})
+    write_job(json_path, data)
+
+
+async def process_job_async(
+    json_path: Union[str, Path],
+    force_process: bool = False,
+    limiter: PriorityLimiter | None = None,
+    force_new_variant: bool = False,
+    variants: int | None = None,
+    keep: int | None = None,
+) -> None:
+    """Run one job through generate → poll → download without blocking the loop.
+
+    Args:
+        json_path: Path to the JSON file (can be string or Path object)
+        force_process: Whether to force processing even if status doesn't match
+        limiter: Shared limiter that caps how many jobs run at once; short
+            songs (see ``job_priority``) get a free slot first
+        force_new_variant: Generate again even if an identical payload already
+            produced a song (also set via ``"force_new_variant": true`` in the JSON)
+        variants: Generate this many variants in parallel (also set via
+            ``"variant_count"`` in the JSON), see ``process_variants_async``
+        keep: Stop once this many variants are done (JSON: ``"variant_keep"``)
+    """
+    json_path = Path(json_path)
+    bind_log_context(job=json_path.name)
+    logger.info(f"Processing job for file: {json_path}")
+    timing = JobTiming(job=json_path.name)
+
+    data = load_job(json_path)
+    if data is None:
+        return
+
+    if data.get("Status") != PENDING_STATUS and not force_process:
+        logger.info(f"Skipping {json_path} (no pending job)")
+        return
+
+    ledger = get_ledger()
+    # Watcher und Streamlit-Hintergrund-Jobs sehen dieselben Dateien: nur einer darf sie bearbeiten
+    if not ledger.claim(json_path):
+        logger.info(f"Skipping {json_path} (already handled by {ledger.owner(json_path)})")
+        return
+    try:
+        # Erneut lesen: der vorige Besitzer kann den Job inzwischen erledigt haben
+        data = load_job(json_path)
+        if data is None or (data.get("Status") != PENDING_STATUS and not force_process):
+            logger.info(f"Skipping {json_path} (finished by another runner)")
+            return
+        await _run_claimed_job(json_path, data, timing, limiter, force_new_variant, variants, keep)
+    finally:
+        ledger.release(json_path)
+
+
+async def _run_claimed_job(
+    json_path: Path,
+    data: Dict[str, Any],
+    timing: JobTiming,
+    limiter: PriorityLimiter | None,
+    force_new_variant: bool,
+    variants: int | None,
+    keep: int | None,
+) -> None:
+    """Body of ``process_job_async`` once this process owns the job."""
+    count = int(variants or data.get("variant_count") or 1)
+    if count > 1:
+        await process_variants_async(
+            json_path, count, keep or data.get("variant_keep"), limiter
+        )
+        return
+
+    ledger = get_ledger()
+    entry = ledger.get(json_path)
+
+    payload = build_payload(data)
+    digest = payload_hash(payload)
+    force_new_variant = bool(data.pop("force_new_variant", False)) or force_new_variant
+
+    async with (limiter or PriorityLimiter(1)).slot(job_priority(data)):
+        timing.queue_wait_s = time.monotonic() - timing.queued_at
+        try:
+            resumable = entry and entry["state"] in ACTIVE_STATES and entry["task_id"]
+            if resumable and entry["payload_hash"] != digest:
+                # JSON wurde seit dem Einreichen geändert (z. B. neue Lyrics im Formular):
+                # der alte Task gehört nicht mehr zu diesem Inhalt.
+                logger.info(f"Not resuming task {entry['task_id']} for {json_path}: job content changed")
+                resumable = False
+            if resumable:
+                # Watcher wurde neu gestartet: Task läuft bei Mureka bereits weiter.
+                task_id = entry["task_id"]
+                submitted_at = time.monotonic() - (time.time() - entry["created_at"])
+                logger.info(f"Resuming task {task_id} for {json_path} (ledger state {entry['state']})")
+            else:
+                logger.info(f"Created payload for task with title: {payload.get('title', 'No title')}")
+
+                hit = None if force_new_variant else ledger.lookup_payload(digest)
+                if hit and not Path(hit["output_path"]).exists():
+                    ledger.forget_payload(digest)
+                    hit = None
+                CACHE_STATS["hit" if hit else "miss"] += 1
+                logger.info(
+                    f"Payload cache {'hit' if hit else 'bypass' if force_new_variant else 'miss'} "
+                    f"for {json_path} (hits={CACHE_STATS['hit']}, misses={CACHE_STATS['miss']})"
+                )
+                if hit:
+                    ledger.cached(json_path, hit["task_id"], hit["output_path"])
+                    data.update(
+                        {
+                            "Status": "fertig",
+                            "task_id": hit["task_id"],
+                            "output_path": hit["output_path"],
+                            "message": "OK (identischer Song bereits vorhanden)",
+                        }
+                    )
+                    write_job(json_path, data)
+                    record_job(timing, "cached")
+                    return
+
+                # Handle optional uploads
+                for uid in UPLOAD_IDS:
+                    await asyncio.to_thread(complete_upload, uid)
+
+                submitted_at = time.monotonic()
+                task_id = await generate_async(payload)
+                timing.generate_s = time.monotonic() - submitted_at
+                ledger.submitted(json_path, task_id, digest)
+                data["task_id"] = task_id
+                write_job(json_path, data)
+                logger.info(f"Started task {task_id}")
+
+            bind_log_context(task=task_id)
+            ledger.set_state(json_path, POLLING)
+            task = await get_poller().wait(task_id, submitted_at, timing)
+            logger.info("Task completed successfully")
+
+            ledger.set_state(json_path, DOWNLOADING)
+            mp3_path = await fetch_song(task, task_id, data, timing)
+            ledger.set_state(json_path, DONE, output_path=str(mp3_path), message="OK")
+            ledger.remember_payload(digest, task_id, str(mp3_path))
+
+            # Update data with new information
+            data.update(
+                {
+                    "Status": "fertig",
+                    "task_id": task_id,
+                    "output_path": str(mp3_path),
+                    "message": "OK",
+                }
+            )
+            logger.info("Updated job data with success status")
+
+        except Exception as exc:
+            error_msg = str(exc)
+            logger.error(f"Error processing job: {error_msg}")
+            ledger.set_state(json_path, FAILED, message=error_msg)
+            data.update({"Status": "fehler", "message": error_msg})
 
     # Write updated data back to file
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump([data], f, ensure_ascii=False, indent=2)
-    logger.info(f"Updated JSON file: {json_path}")
+    write_job(json_path, data)
+    record_job(timing, "done" if data.get("Status") == "fertig" else "failed")
+
+
+def process_job(
+    json_path: Union[str, Path],
+    force_process: bool = False,
+    force_new_variant: bool = False,
+    variants: int | None = None,
+    keep: int | None = None,
+) -> None:
+    """Process a job from a JSON file.
+    
+    Args:
+        json_path: Path to the JSON file (can be string or Path object)
+        force_process: Whether to force processing even if status doesn't match
+        force_new_variant: Bypass the payload cache and always generate a new song
+        variants: Number of variants to generate in parallel
+        keep: Stop once this many variants are done
+    """
+    asyncio.run(
+        process_job_async(
+            json_path,
+            force_process,
+            force_new_variant=force_new_variant,
+            variants=variants,
+            keep=keep,
+        )
+    )
+
+
+class BackgroundJobs:
+    """Runs jobs submitted from other threads (the Streamlit UI) on one event loop.
+
+    All jobs share a single daemon thread and one ``PriorityLimiter``; a job
+    waiting for Mureka only costs a pending task on the loop, not a thread.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_JOBS) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._limiter = PriorityLimiter(max_concurrent)
+        self._running: Dict[Path, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="mureka-jobs", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, json_path: Union[str, Path], **kwargs: Any) -> bool:
+        """Queue ``process_job_async`` for a file; False if it is already running.
+
+        Args:
+            json_path: Path to the JSON file
+            **kwargs: Passed on to ``process_job_async`` (e.g. ``variants``, ``keep``)
+        """
+        json_path = Path(json_path).resolve()
+        with self._lock:
+            running = self._running.get(json_path)
+            if running is not None and not running.done():
+                return False
+            future = asyncio.run_coroutine_threadsafe(
+                process_job_async(json_path, limiter=self._limiter, **kwargs), self._loop
+            )
+            self._running[json_path] = future
+        future.add_done_callback(lambda f, p=json_path: self._finished(p, f))
+        logger.info(f"Queued {json_path} in background (limit {MAX_CONCURRENT_JOBS} parallel jobs)")
+        return True
+
+    def _finished(self, json_path: Path, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            if self._running.get(json_path) is future:
+                del self._running[json_path]
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Background job for {json_path} failed: {future.exception()}")
+
+    def is_running(self, json_path: Union[str, Path]) -> bool:
+        with self._lock:
+            return Path(json_path).resolve() in self._running
+
+
+_background_jobs: BackgroundJobs | None = None
+_background_jobs_lock = threading.Lock()
+
+
+def get_background_jobs() -> BackgroundJobs:
+    """Return the process-wide background runner, starting its thread on first use."""
+    global _background_jobs
+    if _background_jobs is None:
+        with _background_jobs_lock:
+            if _background_jobs is None:
+                _background_jobs = BackgroundJobs()
+    return _background_jobs
+
+
+class _JobFileEvents(FileSystemEventHandler):
+    """Forward create/modify/move events for *.json files into the asyncio loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue) -> None:
+        self._loop = loop
+        self._queue = queue
+
+    def _push(self, path: str) -> None:
+        if path.endswith(".json"):
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, Path(path))
+
+    def on_created(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self._push(event.src_path)
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self._push(event.src_path)
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self._push(event.dest_path)
+
+
+async def watch_folder_async(
+    poll_interval: int = 10,
+    max_concurrent: int = MAX_CONCURRENT_JOBS,
+    rescan_every: int = RESCAN_EVERY,
+) -> None:
+    """React to file events and schedule pending jobs.
+
+    New files dropped into FILES_DIR are moved into the active storage tier
+    first; jobs are read from there. An mtime-keyed JsonIndex makes sure only
+    new or changed files are parsed. A full (stat-only) rescan every
+    ``rescan_every`` seconds catches events the file system might have dropped.
+    """
+    limiter = PriorityLimiter(max_concurrent)
+    in_flight: Dict[Path, asyncio.Task] = {}
+    active_dir = STORE_DIR / ACTIVE
+    active_dir.mkdir(parents=True, exist_ok=True)
+    index = JsonIndex(active_dir, recursive=True)
+    inbox = FILES_DIR.resolve()
+    events: asyncio.Queue = asyncio.Queue()
+
+    for entry in get_ledger().unfinished():
+        logger.info(f"Ledger: task {entry['task_id']} for {entry['json_path']} still {entry['state']}, will resume")
+
+    def consider(json_file: Path, entry: IndexEntry | None) -> None:
+        if json_file in in_flight or entry is None:
+            return
+        if entry.error is not None and json_file.exists():
+            load_job(json_file)  # markiert kaputte Dateien als "fehler"
+            return
+        if first_record(entry.data).get("Status") != PENDING_STATUS:
+            return
+        logger.info(f"Queueing {json_file} (limit {max_concurrent} parallel jobs)")
+        task = asyncio.create_task(process_job_async(json_file, limiter=limiter))
+        task.add_done_callback(lambda _t, p=json_file: in_flight.pop(p, None))
+        in_flight[json_file] = task
+
+    observer = Observer()
+    handler = _JobFileEvents(asyncio.get_running_loop(), events)
+    observer.schedule(handler, str(FILES_DIR))
+    observer.schedule(handler, str(active_dir), recursive=True)
+    observer.start()
+    try:
+        while True:
+            await asyncio.to_thread(ingest, FILES_DIR)
+            for path, entry in index.scan().items():
+                consider(Path(path), entry)
+            deadline = time.monotonic() + rescan_every
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    json_file = await asyncio.wait_for(events.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                # Editoren/Streamlit schreiben in mehreren Schritten – kurz sammeln.
+                await asyncio.sleep(min(poll_interval, 0.5))
+                changed = {json_file}
+                while not events.empty():
+                    changed.add(events.get_nowait())
+                if any(path.parent.resolve() == inbox for path in changed):
+                    changed |= set(await asyncio.to_thread(ingest, FILES_DIR))
+                for path in changed:
+                    if path.parent.resolve() != inbox:
+                        consider(path, index.get(path))
+    finally:
+        observer.stop()
+        observer.join()
 
 
 def watch_folder(poll_interval: int = 10) -> None:
-    FILES_DIR.mkdir(exist_ok=True)
-    logger.info(f"Starting batch client - watching {FILES_DIR.resolve()}")
+    FILES_DIR.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Starting batch client - watching {FILES_DIR.resolve()} and {STORE_DIR / ACTIVE}")
     
     if not API_KEY:
         die("env MUREKA_API_KEY fehlt oder ist leer")
 
-    while True:
-        for json_file in FILES_DIR.glob("*.json"):
-            process_job(json_file)
-        time.sleep(poll_interval)
+    asyncio.run(watch_folder_async(poll_interval))
 
 
 if __name__ == "__main__":
+    setup_logging("api")
     try:
         watch_folder()
     except Exception as e:
@@ -11,10 +11,13 @@ env:
 """
 
 from __future__ import annotations
-import os, sys, time, json, requests, itertools
+import os, sys, time, json, itertools
 from pathlib import Path
 from typing import Any, Dict, List, Union
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import transport  # gemeinsamer HTTP-Pool mit Retries (main_API/transport.py)
+
 # ---------------------------------------------------------------------------
 UPLOAD_IDS: List[str] = []                 # z.B. ["1436211"]
 PAYLOAD: Dict[str, Any] = {
@@ -34,7 +37,6 @@ API_KEY    = "op_ma3twdh4M5gm7iiN819wpZ3TrRxvvA8"
 HEADERS    = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
 OUT_DIR    = Path("./output")
 POLL_EVERY = 3
-TIMEOUT    = 120
 # ---------------------------------------------------------------------------
 
 
@@ -44,7 +46,7 @@ def die(msg: str) -> None:
 
 
 def post(route: str, body: Dict[str, Any]) -> Dict[str, Any]:
-    r = requests.post(f"{BASE}{route}", headers=HEADERS, json=body, timeout=TIMEOUT)
+    r = transport.post(f"{BASE}{route}", route=route, headers=HEADERS, json=body)
     if r.status_code != 200:
         die(f"{route} → {r.status_code}: {r.text[:200]}…")
     return r.json()
@@ -68,7 +70,7 @@ def poll(tid: str) -> Dict[str, Any]:
     url = f"{BASE}/song/query/{tid}"
     spin = itertools.cycle("⠋⠙⠹⠸⠼⠴⠦⠧")
     while True:
-        r = requests.get(url, headers=HEADERS, timeout=TIMEOUT)
+        r = transport.get(url, route="/song/query", headers=HEADERS)
         if r.status_code != 200:
             die(f"Polling-Fehler {r.status_code}: {r.text[:120]}…")
         data = r.json()
@@ -112,7 +114,7 @@ def fallback_stem(song_id: str) -> str | None:
 
 
 def download(url: str, tid: str) -> None:
-    r = requests.get(url, timeout=TIMEOUT)
+    r = transport.get(url, route="download")
     if r.status_code != 200:
         die(f"Download-Fehler {r.status_code}: {r.text[:120]}…")
     OUT_DIR.mkdir(exist_ok=True)
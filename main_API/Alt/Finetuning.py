@@ -4,7 +4,9 @@ import time
 import json
 import glob
 import argparse
-import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import transport  # gemeinsamer HTTP-Pool mit Retries (main_API/transport.py)
 
 def upload_file(filepath, api_key):
     """
@@ -20,7 +22,7 @@ def upload_file(filepath, api_key):
     data = {
         "purpose": "finetune"
     }
-    resp = requests.post(url, headers=headers, files=files, data=data)
+    resp = transport.post(url, route="/uploads", headers=headers, files=files, data=data)
     if resp.status_code != 200:
         print(f"[ERROR] Upload von '{filepath}' fehlgeschlagen (Status {resp.status_code}): {resp.text}")
         sys.exit(1)
@@ -46,7 +48,7 @@ def create_finetune_job(file_ids, base_model, suffix, api_key):
         "suffix": suffix,
         "training_data": file_ids
     }
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = transport.post(url, route="/finetuning", headers=headers, json=payload)
     if resp.status_code != 200:
         print(f"[ERROR] Fine-Tuning-Job erstellen fehlgeschlagen (Status {resp.status_code}): {resp.text}")
         sys.exit(1)
@@ -69,7 +71,7 @@ def wait_for_finetune(finetune_id, api_key, interval=60):
     }
     print(f"⏳ Warte auf Abschluss des Fine-Tuning-Jobs (Polling alle {interval} s)…")
     while True:
-        resp = requests.get(url, headers=headers)
+        resp = transport.get(url, route="/finetuning", headers=headers)
         if resp.status_code != 200:
             print(f"[ERROR] Status-Abfrage fehlgeschlagen (Status {resp.status_code}): {resp.text}")
             sys.exit(1)
@@ -115,7 +117,7 @@ def generate_song_from_json(song_json_path, model_name, api_key):
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
-    resp = requests.post(url, headers=headers, json=song_payload)
+    resp = transport.post(url, route="/song/generate", headers=headers, json=song_payload)
     if resp.status_code != 200:
         print(f"[ERROR] Song-Generierung fehlgeschlagen (Status {resp.status_code}): {resp.text}")
         sys.exit(1)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Last-Benchmark für den Mureka-Batch-Client (API.py) gegen fake_mureka.py
+------------------------------------------------------------------------
+• legt N synthetische files/*.json-Jobs in einem Temp-Verzeichnis an
+• startet den Fake-Server im selben Prozess (oder nutzt --base-url)
+• schickt alle Jobs durch API.process_job_async (gemeinsamer PriorityLimiter)
+• meldet Jobs/Minute, p50/p95 End-to-End-Latenz und Anfragen pro Job
+• Ledger, Metriken, Ablage und Vorschauen landen alle im Temp-Verzeichnis;
+  Vorschauen (ffmpeg) nur mit --previews, ihre Zeit wird getrennt ausgewiesen
+
+  python benchmark.py --jobs 50 --concurrency 10 --gen-min 5 --gen-max 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import fake_mureka
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def write_jobs(files_dir: Path, count: int) -> List[Path]:
+    files_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = files_dir / f"Song_Benchmark_{i:04d}.json"
+        job = {
+            "Titel": f"Benchmark {i}",
+            "Firma": "Benchmark GmbH",
+            "Lyrics": f"[Verse]\nZeile {i}\n",
+            "Description": "pop, upbeat",
+            "Status": "An Mureka weitergegeben",
+        }
+        path.write_text(json.dumps([job], ensure_ascii=False), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark für API.py gegen Fake-Mureka")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--base-url", help="laufender Fake-Server, sonst wird einer gestartet")
+    parser.add_argument("--gen-min", type=float, default=3.0)
+    parser.add_argument("--gen-max", type=float, default=8.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--http-error-rate", type=float, default=0.0)
+    parser.add_argument("--no-url-rate", type=float, default=0.2)
+    parser.add_argument("--mp3-size", type=int, default=500_000)
+    parser.add_argument("--poll-every", type=float, default=1.0)
+    parser.add_argument("--generate-per-min", type=float, default=600.0)
+    parser.add_argument("--previews", action="store_true", help="Vorschauen mit ffmpeg erzeugen und getrennt messen")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="mureka_bench_"))
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = fake_mureka.serve(
+            fake_mureka.FakeConfig(
+                latency=args.latency,
+                gen_min=args.gen_min,
+                gen_max=args.gen_max,
+                fail_rate=args.fail_rate,
+                http_error_rate=args.http_error_rate,
+                no_url_rate=args.no_url_rate,
+                mp3_size=args.mp3_size,
+            )
+        )
+        base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    # API.py liest Pfade und Limits beim Import – daher vorher setzen.
+    os.environ["MUREKA_BASE_URL"] = base_url
+    os.environ["MUREKA_LEDGER"] = str(workdir / "jobs.sqlite3")
+    os.environ["MUREKA_METRICS"] = str(workdir / "metrics.json")
+    os.environ["PREVIEW_DIR"] = str(workdir / "previews")
+    os.environ["SOUNDBRANDING_STORE"] = str(workdir / "ablage")
+    os.environ["SOUNDBRANDING_INBOX"] = str(workdir / "files")
+    os.environ["MUREKA_GENERATE_PER_MIN"] = str(args.generate_per_min)
+    os.environ["MUREKA_GENERATE_BURST"] = str(args.concurrency)
+    os.environ["MUREKA_REQUESTS_PER_MIN"] = "100000"
+    os.environ["MUREKA_REQUESTS_BURST"] = "1000"
+    os.chdir(workdir)
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import API
+    import transport
+
+    API.POLL_EVERY = args.poll_every
+    API.POLL_MAX_INTERVAL = args.poll_every * 3
+
+    # ffmpeg gehört nicht zum Durchsatz des Clients: abschalten oder getrennt messen
+    preview_times: List[float] = []
+
+    def timed_preview(source: Path) -> Dict | None:
+        start = time.monotonic()
+        try:
+            return ensure_preview(source)
+        finally:
+            preview_times.append(time.monotonic() - start)
+
+    ensure_preview = API.ensure_preview
+    API.ensure_preview = timed_preview if args.previews else (lambda source: None)
+
+    paths = write_jobs(workdir / "files", args.jobs)
+    latencies: Dict[Path, float] = {}
+
+    async def timed(path: Path, limiter: API.PriorityLimiter) -> None:
+        start = time.monotonic()
+        await API.process_job_async(path, limiter=limiter)
+        latencies[path] = time.monotonic() - start
+
+    async def run() -> None:
+        limiter = API.PriorityLimiter(args.concurrency)
+        await asyncio.gather(*(timed(p, limiter) for p in paths))
+
+    print(f"🏁  {args.jobs} Jobs, {args.concurrency} parallel, Fake-Mureka unter {base_url}")
+    started = time.monotonic()
+    asyncio.run(run())
+    wall = time.monotonic() - started
+
+    ok = sum(1 for p in paths if API.load_job(p).get("Status") == "fertig")
+    stats = transport.get(base_url.rsplit("/v1", 1)[0] + "/_stats").json()["requests"]
+    api_requests = sum(v for k, v in stats.items() if "/files/" not in k)
+    lat = list(latencies.values())
+
+    print(f"⏱️   Laufzeit:          {wall:.1f}s")
+    print(f"✅  erfolgreich:       {ok}/{args.jobs}")
+    print(f"📈  Durchsatz:         {ok / wall * 60:.1f} Jobs/min")
+    print(f"⏳  Latenz p50/p95:    {percentile(lat, 0.5):.1f}s / {percentile(lat, 0.95):.1f}s "
+          f"(Mittel {statistics.mean(lat):.1f}s)")
+    if args.previews:
+        print(f"🖼️   Vorschauen:        {len(preview_times)} in {sum(preview_times):.1f}s "
+              f"(p50 {percentile(preview_times, 0.5):.2f}s, in Laufzeit und Latenz enthalten)")
+    print(f"🔁  API-Anfragen/Job:  {api_requests / max(args.jobs, 1):.2f}")
+    for route, count in sorted(stats.items()):
+        print(f"     {route:<28} {count}")
+    print(f"📂  Arbeitsverzeichnis: {workdir}")
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
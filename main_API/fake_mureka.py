@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Lokaler Mureka-Ersatz für Tests und Benchmarks (kostet keine Credits)
+--------------------------------------------------------------------
+• POST /v1/song/generate       → neue Task mit zufälliger Laufzeit
+• GET  /v1/song/query/<id>     → preparing → running → succeeded (oder failed)
+• POST /v1/song/stem           → Download-URL für song_id (master als MP3, sonst WAV)
+• POST /v1/uploads/complete    → bestätigt Upload-IDs
+• GET  /files/<id>.mp3|.wav    → Dummy-Audio, unterstützt Range-Requests
+• GET  /_stats                 → Anfragen pro Route (für benchmark.py)
+
+Antworten verwenden zufällig die URL-Schlüssel, die API.find_url kennt, und
+verstecken die URL teils verschachtelt oder lassen sie ganz weg
+(→ Fallback über /song/stem).
+
+  python fake_mureka.py --port 8765 --gen-min 20 --gen-max 60
+  export MUREKA_BASE_URL=http://127.0.0.1:8765/v1
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+URL_KEYS = ("audio_url", "url", "mp3_url", "song_url", "download_url")
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.05          # Sekunden pro Antwort
+    gen_min: float = 5.0           # minimale Generierungsdauer
+    gen_max: float = 15.0          # maximale Generierungsdauer
+    fail_rate: float = 0.0         # Anteil der Tasks, die mit "failed" enden
+    http_error_rate: float = 0.0   # Anteil der Anfragen mit 500/503
+    rate_limit_rate: float = 0.0   # Anteil der generate-Aufrufe mit 429
+    no_url_rate: float = 0.2       # Anteil fertiger Tasks ohne URL (→ /song/stem)
+    mp3_size: int = 1_000_000      # Bytes pro Dummy-MP3
+
+
+@dataclass
+class FakeTask:
+    task_id: str
+    created: float
+    duration: float
+    fails: bool
+    url_shape: int
+
+
+class FakeMureka:
+    """State shared by all handler threads."""
+
+    def __init__(self, config: FakeConfig) -> None:
+        self.config = config
+        self.tasks: Dict[str, FakeTask] = {}
+        self.stats: Counter = Counter()
+        self.lock = threading.Lock()
+        self._ids = itertools.count(70_000_000_000_000)
+        self._payload = bytes(random.getrandbits(8) for _ in range(4096))
+
+    def new_task(self) -> FakeTask:
+        cfg = self.config
+        with self.lock:
+            task = FakeTask(
+                task_id=str(next(self._ids)),
+                created=time.monotonic(),
+                duration=random.uniform(cfg.gen_min, cfg.gen_max),
+                fails=random.random() < cfg.fail_rate,
+                url_shape=-1 if random.random() < cfg.no_url_rate else random.randrange(3),
+            )
+            self.tasks[task.task_id] = task
+        return task
+
+    def mp3_bytes(self, start: int, end: int) -> bytes:
+        size = end - start
+        repeated = self._payload * (size // len(self._payload) + 2)
+        offset = start % len(self._payload)
+        return repeated[offset:offset + size]
+
+    def task_body(self, task: FakeTask, base_url: str) -> Dict[str, Any]:
+        elapsed = time.monotonic() - task.created
+        if elapsed < min(2.0, task.duration / 4):
+            return {"id": task.task_id, "status": "preparing"}
+        if elapsed < task.duration:
+            return {"id": task.task_id, "status": "running"}
+        if task.fails:
+            return {"id": task.task_id, "status": "failed", "failed_reason": "fake failure"}
+
+        url = f"{base_url}/files/{task.task_id}.mp3"
+        key = random.choice(URL_KEYS)
+        body: Dict[str, Any] = {"id": task.task_id, "status": "succeeded", "song_id": task.task_id}
+        if task.url_shape == 0:
+            body[key] = url
+        elif task.url_shape == 1:
+            body["choices"] = [{"index": 0, key: url, "duration": int(task.duration * 1000)}]
+        elif task.url_shape == 2:
+            body["output"] = {"song": {"oss_key": "songs/x.mp3", key: url}}
+        return body
+
+
+def make_handler(fake: FakeMureka):
+    cfg = fake.config
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: Any) -> None:  # noqa: D401 – ruhig bleiben
+            pass
+
+        @property
+        def base_url(self) -> str:
+            return f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+        def _route(self) -> str:
+            path = self.path.split("?", 1)[0]
+            return re.sub(r"/\d+(_\w+)?(\.mp3|\.wav)?$", "/<id>", path)
+
+        def _json(self, status: int, body: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _prelude(self) -> bool:
+            """Count the request, simulate latency and random server errors."""
+            if self.path == "/_stats":
+                return True
+            with fake.lock:
+                fake.stats[f"{self.command} {self._route()}"] += 1
+            time.sleep(cfg.latency)
+            if random.random() < cfg.http_error_rate:
+                self._json(random.choice((500, 503)), {"error": "fake outage"})
+                return False
+            return True
+
+        def _read_body(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            try:
+                return json.loads(raw or b"{}")
+            except ValueError:
+                return {}
+
+        def do_POST(self) -> None:
+            body = self._read_body()
+            if not self._prelude():
+                return
+            if self.path == "/v1/song/generate":
+                if random.random() < cfg.rate_limit_rate:
+                    self._json(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                    return
+                task = fake.new_task()
+                self._json(200, {"id": task.task_id, "status": "preparing", "created_at": int(time.time())})
+            elif self.path == "/v1/song/stem":
+                song_id = str(body.get("song_id", ""))
+                stem_type = body.get("type", "master")
+                name = f"{song_id}.mp3" if stem_type == "master" else f"{song_id}_{stem_type}.wav"
+                self._json(200, {"data": {"download_url": f"{self.base_url}/files/{name}"}})
+            elif self.path == "/v1/uploads/complete":
+                self._json(200, {"id": body.get("upload_id"), "status": "completed"})
+            else:
+                self._json(404, {"error": f"unknown route {self.path}"})
+
+        def do_GET(self) -> None:
+            if not self._prelude():
+                return
+            if self.path == "/_stats":
+                with fake.lock:
+                    self._json(200, {"requests": dict(fake.stats), "tasks": len(fake.tasks)})
+                return
+            match = re.fullmatch(r"/v1/song/query/(\d+)", self.path)
+            if match:
+                task = fake.tasks.get(match.group(1))
+                if task is None:
+                    self._json(404, {"error": "unknown task"})
+                else:
+                    self._json(200, fake.task_body(task, self.base_url))
+                return
+            if re.fullmatch(r"/files/\d+(_\w+)?\.(mp3|wav)", self.path):
+                self._send_mp3()
+                return
+            self._json(404, {"error": f"unknown route {self.path}"})
+
+        def _send_mp3(self) -> None:
+            size = cfg.mp3_size
+            start, status = 0, 200
+            rng = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+            if rng:
+                start, status = int(rng.group(1)), 206
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+            self.send_response(status)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Content-Length", str(size - start))
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+            self.end_headers()
+            chunk = 64 * 1024
+            for offset in range(start, size, chunk):
+                self.wfile.write(fake.mp3_bytes(offset, min(offset + chunk, size)))
+
+    return Handler
+
+
+def serve(config: FakeConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake server in a background thread and return it."""
+    server = ThreadingHTTPServer((host, port), make_handler(FakeMureka(config)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lokaler Mureka-Ersatz")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=FakeConfig.latency)
+    parser.add_argument("--gen-min", type=float, default=FakeConfig.gen_min)
+    parser.add_argument("--gen-max", type=float, default=FakeConfig.gen_max)
+    parser.add_argument("--fail-rate", type=float, default=FakeConfig.fail_rate)
+    parser.add_argument("--http-error-rate", type=float, default=FakeConfig.http_error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=FakeConfig.rate_limit_rate)
+    parser.add_argument("--no-url-rate", type=float, default=FakeConfig.no_url_rate)
+    parser.add_argument("--mp3-size", type=int, default=FakeConfig.mp3_size)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        latency=args.latency,
+        gen_min=args.gen_min,
+        gen_max=args.gen_max,
+        fail_rate=args.fail_rate,
+        http_error_rate=args.http_error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        no_url_rate=args.no_url_rate,
+        mp3_size=args.mp3_size,
+    )
+    server = serve(config, args.host, args.port)
+    print(f"🎭  Fake-Mureka läuft auf http://{args.host}:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("\n⛔️  Abbruch.")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# job_index.py
+# Im Speicher gehaltener Index der JSON-Dateien in files/ bzw. einer Ablage-Partition.
+# Dateien werden nur neu geparst, wenn sich mtime oder Größe geändert haben;
+# unveränderte Einträge kosten pro Durchlauf nur ein stat().
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Union
+
+
+@dataclass
+class IndexEntry:
+    mtime_ns: int
+    size: int
+    ctime: float
+    data: Any
+    error: str | None = None
+
+
+def _stat_key(st: os.stat_result) -> tuple:
+    return st.st_mtime_ns, st.st_size
+
+
+class JsonIndex:
+    """mtime/size-keyed cache of parsed JSON files in one directory.
+
+    With ``recursive=True`` subdirectories are included (storage partitions
+    with one folder per customer).
+    """
+
+    def __init__(self, directory: Union[str, Path], recursive: bool = False) -> None:
+        self.directory = Path(directory)
+        self.recursive = recursive
+        self.parses = 0
+        self._entries: Dict[str, IndexEntry] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path: str, st: os.stat_result) -> IndexEntry:
+        self.parses += 1
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data, error = json.load(f), None
+        except (OSError, ValueError) as exc:
+            data, error = None, str(exc)
+        return IndexEntry(st.st_mtime_ns, st.st_size, st.st_ctime, data, error)
+
+    def get(self, path: Union[str, Path]) -> IndexEntry | None:
+        """Return the entry for ``path``, re-parsing it only if it changed."""
+        path = str(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.discard(path)
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and (entry.mtime_ns, entry.size) == _stat_key(st):
+                return entry
+        entry = self._load(path, st)
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def discard(self, path: Union[str, Path]) -> None:
+        with self._lock:
+            self._entries.pop(str(path), None)
+
+    def scan(self) -> Dict[str, IndexEntry]:
+        """Refresh the index from disk and return ``{path: entry}`` for all *.json files."""
+        seen: Dict[str, IndexEntry] = {}
+        if not self.directory.exists():
+            return seen
+        pending = [str(self.directory)]
+        while pending:
+            with os.scandir(pending.pop()) as it:
+                for dirent in it:
+                    if self.recursive and dirent.is_dir():
+                        pending.append(dirent.path)
+                        continue
+                    if not dirent.name.endswith('.json') or not dirent.is_file():
+                        continue
+                    st = dirent.stat()
+                    with self._lock:
+                        entry = self._entries.get(dirent.path)
+                    if entry is None or (entry.mtime_ns, entry.size) != _stat_key(st):
+                        entry = self._load(dirent.path, st)
+                    seen[dirent.path] = entry
+        with self._lock:
+            self._entries = seen
+        return dict(seen)
+
+
+def first_record(data: Any) -> Dict[str, Any]:
+    """Job files hold either a dict or a one-element list with the dict."""
+    if isinstance(data, list) and data:
+        data = data[0]
+    return data if isinstance(data, dict) else {}
@@ -0,0 +1,405 @@
+# ledger.py
+# Dauerhaftes Job-Journal (SQLite) für die Mureka-Jobs.
+# Die task_id wird sofort nach /song/generate gespeichert, damit ein Neustart
+# des Watchers wieder ins Polling einsteigt statt den Song neu zu generieren.
+# Die JSON-Dateien der Ablage (storage.py) bleiben als gespiegelte Ansicht für main.py erhalten.
+# Varianten einer Songidee (mehrere parallele Generierungen) stehen als
+# Geschwister in der Tabelle variants. Fertige Downloads landen in der
+# Warteschlange handoff, aus der voiceclone.py seine Arbeit holt.
+# stage_events sammelt pro abgeschlossener Stufe der Kette eine Zeile
+# (Dauer, Ergebnis) für den Pipeline-Tab in main.py.
+
+from __future__ import annotations
+
+import contextlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Union
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Unabhängig vom Arbeitsverzeichnis; voiceclone.py liest dieselbe Variable
+LEDGER_PATH: Path = Path(os.getenv("MUREKA_LEDGER", os.path.join(BASE_DIR, "jobs.sqlite3")))
+
+SUBMITTED = "submitted"
+POLLING = "polling"
+DOWNLOADING = "downloading"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES: tuple = (SUBMITTED, POLLING, DOWNLOADING)
+QUEUED = "queued"
+CLAIMED = "claimed"
+# Wer einen Job gerade bearbeitet (Streamlit-Hintergrund-Jobs oder der Watcher)
+OWNER: str = f"{socket.gethostname()}:{os.getpid()}"
+# Stufen der Kette Anfrage → Songidee → Mureka → Voice-Cloning → Stems
+STAGES: tuple = ("anfrage", "songidee", "mureka", "handoff_wait", "voiceclone", "stems")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_key     TEXT PRIMARY KEY,
+    json_path   TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    task_id     TEXT,
+    output_path TEXT,
+    message     TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    owner       TEXT,
+    payload_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state);
+CREATE TABLE IF NOT EXISTS payload_cache (
+    payload_hash TEXT PRIMARY KEY,
+    task_id      TEXT NOT NULL,
+    output_path  TEXT NOT NULL,
+    created_at   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS variants (
+    job_key     TEXT NOT NULL,
+    variant     INTEGER NOT NULL,
+    state       TEXT NOT NULL,
+    task_id     TEXT,
+    output_path TEXT,
+    message     TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (job_key, variant)
+);
+CREATE TABLE IF NOT EXISTS handoff (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    path       TEXT NOT NULL,
+    task_id    TEXT,
+    state      TEXT NOT NULL,
+    message    TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner      TEXT
+);
+CREATE INDEX IF NOT EXISTS handoff_state ON handoff(state, id);
+CREATE TABLE IF NOT EXISTS stage_events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    stage       TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    duration_s  REAL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stage_events_time ON stage_events(finished_at);
+"""
+
+
+# Neu einreichen, ohne den Besitzer (claim) des Jobs zu verlieren
+_UPSERT_JOB = (
+    "INSERT INTO jobs "
+    "(job_key, json_path, state, task_id, output_path, message, created_at, updated_at, payload_hash) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(job_key) DO UPDATE SET json_path = excluded.json_path, state = excluded.state, "
+    "task_id = excluded.task_id, output_path = excluded.output_path, message = excluded.message, "
+    "created_at = excluded.created_at, updated_at = excluded.updated_at, payload_hash = excluded.payload_hash"
+)
+
+
+def job_key(json_path: Union[str, Path]) -> str:
+    return str(Path(json_path).resolve())
+
+
+def owner_alive(owner: str) -> bool:
+    """False only if ``owner`` is a process on this host that no longer exists."""
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class JobLedger:
+    """Thin, thread-safe wrapper around the jobs table."""
+
+    def __init__(self, path: Union[str, Path] = LEDGER_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:  # Ledger von vor dem Job-Claim
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        if "payload_hash" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN payload_hash TEXT")
+        if "owner" not in {row[1] for row in self._conn.execute("PRAGMA table_info(handoff)")}:
+            self._conn.execute("ALTER TABLE handoff ADD COLUMN owner TEXT")
+
+    def get(self, json_path: Union[str, Path]) -> Dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE job_key = ?", (job_key(json_path),)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def submitted(
+        self, json_path: Union[str, Path], task_id: str | None, payload_hash: str | None = None
+    ) -> None:
+        """Record a fresh submission; replaces any earlier run of the same file.
+
+        ``payload_hash`` identifies the content that was sent, so a later
+        resume can tell whether the file has been edited in the meantime.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                _UPSERT_JOB,
+                (job_key(json_path), str(json_path), SUBMITTED, task_id, None, None, now, now, payload_hash),
+            )
+
+    def cached(self, json_path: Union[str, Path], task_id: str, output_path: str) -> None:
+        """Record a job that was answered from the payload cache."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                _UPSERT_JOB,
+                (job_key(json_path), str(json_path), DONE, task_id, output_path, "cache", now, now, None),
+            )
+
+    def claim(self, json_path: Union[str, Path], owner: str = OWNER) -> bool:
+        """Take ownership of a job before anything is sent to Mureka.
+
+        Returns False if another live process already holds it. A job seen
+        for the first time gets a ``submitted`` row without task_id, so a
+        second runner sees it even before ``generate`` has returned.
+        """
+        key, now = job_key(json_path), time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT owner FROM jobs WHERE job_key = ?", (key,)).fetchone()
+                if row and row["owner"] not in (None, owner) and owner_alive(row["owner"]):
+                    return False
+                if row:
+                    self._conn.execute("UPDATE jobs SET owner = ? WHERE job_key = ?", (owner, key))
+                else:
+                    self._conn.execute(
+                        "INSERT INTO jobs (job_key, json_path, state, task_id, output_path, message, "
+                        "created_at, updated_at, owner) VALUES (?, ?, ?, NULL, NULL, NULL, ?, ?, ?)",
+                        (key, str(json_path), SUBMITTED, now, now, owner),
+                    )
+                return True
+            finally:
+                self._conn.execute("COMMIT")
+
+    def release(self, json_path: Union[str, Path], owner: str = OWNER) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET owner = NULL WHERE job_key = ? AND owner = ?", (job_key(json_path), owner)
+            )
+
+    def owner(self, json_path: Union[str, Path]) -> str | None:
+        """The live process currently working on the job, if any."""
+        entry = self.get(json_path)
+        if entry and entry["owner"] and owner_alive(entry["owner"]):
+            return entry["owner"]
+        return None
+
+    def set_state(self, json_path: Union[str, Path], state: str, **fields: Any) -> None:
+        columns = {"state": state, "updated_at": time.time(), **fields}
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_key = ?",
+                (*columns.values(), job_key(json_path)),
+            )
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in ACTIVE_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE state IN ({placeholders}) ORDER BY created_at",
+                ACTIVE_STATES,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def variant_submitted(self, json_path: Union[str, Path], variant: int, task_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO variants "
+                "(job_key, variant, state, task_id, output_path, message, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, NULL, NULL, ?, ?)",
+                (job_key(json_path), variant, SUBMITTED, task_id, now, now),
+            )
+
+    def set_variant_state(
+        self, json_path: Union[str, Path], variant: int, state: str, **fields: Any
+    ) -> None:
+        columns = {"state": state, "updated_at": time.time(), **fields}
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE variants SET {assignments} WHERE job_key = ? AND variant = ?",
+                (*columns.values(), job_key(json_path), variant),
+            )
+
+    def variants(self, json_path: Union[str, Path]) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM variants WHERE job_key = ? ORDER BY variant",
+                (job_key(json_path),),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear_variants(self, json_path: Union[str, Path]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM variants WHERE job_key = ?", (job_key(json_path),))
+
+    def relocate(self, old_path: Union[str, Path], new_path: Union[str, Path]) -> None:
+        """Follow a job file that was moved (storage tiers) with its job and variant rows."""
+        old_key, new_key = job_key(old_path), job_key(new_path)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE OR REPLACE jobs SET job_key = ?, json_path = ? WHERE job_key = ?",
+                    (new_key, str(new_path), old_key),
+                )
+                self._conn.execute(
+                    "UPDATE OR REPLACE variants SET job_key = ? WHERE job_key = ?", (new_key, old_key)
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextlib.contextmanager
+    def handoff(self, path: Union[str, Path], task_id: str | None = None) -> Iterator[None]:
+        """Queue a finished file for voice cloning together with its final rename.
+
+        The row is inserted in an open transaction and only committed if the
+        ``with`` block (the rename) succeeds, so a consumer never sees a file
+        that is not complete yet.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO handoff (path, task_id, state, message, created_at, updated_at) "
+                    "VALUES (?, ?, ?, NULL, ?, ?)",
+                    (str(Path(path).resolve()), task_id, QUEUED, now, now),
+                )
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def claim_handoff(self, owner: str = OWNER) -> Dict[str, Any] | None:
+        """Take the oldest queued file for ``owner``, or None if the queue is empty."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM handoff WHERE state = ? ORDER BY id LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE handoff SET state = ?, owner = ?, updated_at = ? WHERE id = ?",
+                        (CLAIMED, owner, time.time(), row["id"]),
+                    )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return dict(row, state=CLAIMED, owner=owner) if row else None
+
+    def finish_handoff(self, handoff_id: int, state: str, message: str | None = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE handoff SET state = ?, message = ?, updated_at = ? WHERE id = ?",
+                (state, message, time.time(), handoff_id),
+            )
+
+    def requeue_handoffs(self) -> int:
+        """Put files a crashed worker had claimed back into the queue.
+
+        Rows of workers that are still running stay claimed.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner FROM handoff WHERE state = ?", (CLAIMED,)
+            ).fetchall()
+            dead = [row["id"] for row in rows if not row["owner"] or not owner_alive(row["owner"])]
+            for handoff_id in dead:
+                self._conn.execute(
+                    "UPDATE handoff SET state = ?, owner = NULL, updated_at = ? WHERE id = ? AND state = ?",
+                    (QUEUED, time.time(), handoff_id, CLAIMED),
+                )
+        return len(dead)
+
+    def record_stage(self, stage: str, status: str, duration_s: float | None = None) -> None:
+        """Append one finished unit of work of a pipeline stage (see STAGES)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO stage_events (stage, status, duration_s, finished_at) VALUES (?, ?, ?, ?)",
+                (stage, status, duration_s, time.time()),
+            )
+
+    def stage_events(self, since: float) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, status, duration_s, finished_at FROM stage_events "
+                "WHERE finished_at >= ? ORDER BY finished_at",
+                (since,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def state_counts(self) -> Dict[str, Dict[str, int]]:
+        """Current number of jobs, variants and handoff entries per state."""
+        counts: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for table in ("jobs", "variants", "handoff"):
+                counts[table] = dict(
+                    self._conn.execute(f"SELECT state, COUNT(*) FROM {table} GROUP BY state").fetchall()
+                )
+        return counts
+
+    def lookup_payload(self, payload_hash: str) -> Dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM payload_cache WHERE payload_hash = ?", (payload_hash,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def remember_payload(self, payload_hash: str, task_id: str, output_path: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO payload_cache VALUES (?, ?, ?, ?)",
+                (payload_hash, task_id, output_path, time.time()),
+            )
+
+    def forget_payload(self, payload_hash: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM payload_cache WHERE payload_hash = ?", (payload_hash,))
+
+
+_ledger: JobLedger | None = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> JobLedger:
+    """Return the process-wide ledger, opening it on first use."""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = JobLedger()
+    return _ledger
@@ -0,0 +1,118 @@
+# log_setup.py
+# Gemeinsame Logging-Konfiguration für API.py und main.py.
+# Aufrufer legen Records nur in eine Queue (QueueHandler), ein eigener Thread
+# (QueueListener) formatiert sie als JSON-Zeilen und schreibt sie in eine
+# größenbegrenzte, rotierte Datei. Jeder Prozess bekommt seine eigene Datei,
+# weil RotatingFileHandler nicht prozessübergreifend rotieren kann:
+#
+#   logs/api.jsonl, logs/api.jsonl.1, …        (Watcher / Batch-Client)
+#   logs/streamlit.jsonl, …                    (Streamlit-App inkl. Hintergrund-Jobs)
+#
+#   jq 'select(.job == "Song_x.json")' logs/*.jsonl
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR: Path = Path(os.getenv("SOUNDBRANDING_LOG_DIR", os.path.join(BASE_DIR, "logs")))
+LOG_LEVEL: str = os.getenv("SOUNDBRANDING_LOG_LEVEL", "INFO")
+LOG_MAX_BYTES: int = int(os.getenv("SOUNDBRANDING_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS: int = int(os.getenv("SOUNDBRANDING_LOG_BACKUPS", "5"))
+
+# Felder, die jeder LogRecord ohnehin hat; alles andere stammt aus extra= oder bind_log_context()
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+_listener: logging.handlers.QueueListener | None = None
+_setup_lock = threading.Lock()
+
+
+def bind_log_context(**fields: Any) -> None:
+    """Attach ``fields`` (e.g. ``job=…``) to every record of the current asyncio task.
+
+    Tasks and ``asyncio.to_thread`` calls started afterwards inherit them,
+    since both copy the current context.
+    """
+    _context.set({**_context.get(), **fields})
+
+
+def clear_log_context() -> None:
+    """Drop inherited fields, e.g. in a long-lived task started from inside a job."""
+    _context.set({})
+
+
+class _ContextFilter(logging.Filter):
+    """Copies the bound context fields onto the record in the calling thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Nur die Argumente einsetzen; den Traceback formatiert JsonFormatter im Listener
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message plus any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(name: str, level: str = LOG_LEVEL) -> None:
+    """Route all logging of this process to ``LOG_DIR/<name>.jsonl`` via a queue.
+
+    Safe to call repeatedly (Streamlit runs main.py again on every rerun);
+    only the first call per process configures anything.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_DIR / f"{name}.jsonl", maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()  # unbegrenzt: put() blockiert nie
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(_ContextFilter())
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # restliche Records beim Beenden noch schreiben
@@ -1,25 +1,36 @@
 import streamlit as st
+import pandas as pd
 import json
 import os
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 import re
+import time
 from urllib.parse import urlparse
-from API import process_job
+from API import PENDING_STATUS, get_background_jobs
+from job_index import JsonIndex, first_record
+from ledger import (
+    CANCELLED, CLAIMED, DONE, DOWNLOADING, FAILED, POLLING, QUEUED, STAGES, SUBMITTED, get_ledger,
+)
+from metrics import HISTOGRAMS, Metrics, percentile
+from search_index import get_search_index
+from storage import (
+    ACTIVE, ANFRAGEN, ARCHIVE, INBOX_DIR, SONGIDEEN,
+    ingest, key_of, move_to, new_path, partition_index, path_of, split_key,
+)
+from media_server import (
+    LOCAL_HOSTS, MEDIA_BASE_URL, MEDIA_PORT, MEDIA_ROOTS, is_local_bind, media_url, start_in_background,
+)
+from previews import PREVIEW_SECONDS, load_sidecar, relocate_preview
+from log_setup import setup_logging
 import logging
 
-# Configure logging
-logging.basicConfig(
-    filename='streamlit_log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Configure logging (nur beim ersten Lauf, Reruns ändern nichts)
+setup_logging("streamlit")
 logger = logging.getLogger(__name__)
 
 # Constants
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-ANFRAGEN_DIR = os.path.join(BASE_DIR, 'files')
 STATUS_COLORS = {
     'ausstehend': 'orange',
     'freigegeben': 'green',
@@ -28,31 +39,281 @@ STATUS_COLORS = {
 }
 
 # Im Constants-Bereich, die Tabs definieren
-TABS = ["Anfrageformular", "Freigabe", "Songideen", "Songs", "David-Style", "Stems"]
+TABS = ["Anfrageformular", "Freigabe", "Songideen", "Songs", "David-Style", "Stems", "Pipeline"]
+PAGE_SIZE = 20  # Einträge pro Seite in den Listen
+# "streamlit": Songs laufen im Hintergrund-Thread dieses Prozesses,
+# "watcher": ein separat gestartetes API.py übernimmt die Dateien
+JOB_RUNNER = os.getenv("SOUNDBRANDING_JOB_RUNNER", "streamlit")
+PROGRESS_REFRESH = 3  # Sekunden zwischen Fortschritts-Aktualisierungen
+JOB_STEPS = {  # Ledger-Status → (Anzeige, Fortschritt)
+    None: ("In Warteschlange", 0.05),
+    SUBMITTED: ("An Mureka übergeben", 0.15),
+    POLLING: ("Mureka generiert", 0.5),
+    DOWNLOADING: ("Wird heruntergeladen", 0.9),
+    DONE: ("Fertig", 1.0),
+    FAILED: ("Fehlgeschlagen", 1.0),
+    CANCELLED: ("Verworfen", 1.0),
+}
+PIPELINE_REFRESH = 10  # Sekunden zwischen Aktualisierungen des Pipeline-Tabs
+PIPELINE_WINDOWS = {  # Zeitraum → (Sekunden, Breite eines Balkens in Sekunden)
+    "Letzte Stunde": (3600, 300),
+    "Letzte 24 Stunden": (86400, 3600),
+    "Letzte 7 Tage": (7 * 86400, 6 * 3600),
+}
+STAGE_LABELS = {
+    "anfrage": "Anfragen",
+    "songidee": "Songideen",
+    "mureka": "Mureka",
+    "handoff_wait": "Warten auf Voice-Cloning",
+    "voiceclone": "Voice-Cloning (RVC)",
+    "stems": "Stems (Demucs)",
+}
 
 # Initialisiere session state für Formulare
 if 'form_submitted' not in st.session_state:
     st.session_state.form_submitted = False
 
+@st.cache_resource
+def get_file_index(tier: str, kind: str) -> JsonIndex:
+    """Shared index of one storage partition (e.g. active Songideen) for all sessions.
+
+    Each rerun only stats that partition; a file is parsed again only when
+    its mtime or size changed. Archived files are never touched by active views.
+    """
+    return partition_index(tier, kind)
+
+def load_indexed_files(kind: str, tier: str = ACTIVE) -> List[tuple]:
+    """Return (key, modification_time, data) for the JSON files of one partition, newest first.
+
+    Keys are store-relative paths (see storage.key_of). New files in the
+    inbox (files/) are sorted into the store first.
+    """
+    if tier == ACTIVE:
+        ingest(INBOX_DIR)
+    files = []
+    for file_path, entry in get_file_index(tier, kind).scan().items():
+        key = key_of(file_path)
+        if entry.error is not None:
+            st.error(f"Fehler beim Laden der Datei {os.path.basename(key)}: {entry.error}")
+            continue
+        # mtime statt ctime: das Verschieben zwischen aktiv/archiv setzt die ctime neu
+        files.append((key, entry.mtime_ns / 1e9, entry.data))
+    files.sort(key=lambda x: x[1], reverse=True)
+    return files
+
+def load_indexed_file(key: str):
+    """Parsed content of one stored file, served from the index if unchanged."""
+    entry = get_file_index(*split_key(key)).get(path_of(key))
+    if entry is None:
+        raise FileNotFoundError(key)
+    if entry.error is not None:
+        raise ValueError(entry.error)
+    return entry.data
+
+def update_search_index(*keys: str) -> None:
+    """Re-index the given stored files in one transaction; keys that no longer exist are dropped."""
+    try:
+        existing = [path_of(key) for key in keys if path_of(key).exists()]
+        missing = [key for key in keys if not path_of(key).exists()]
+        get_search_index().update_files(existing, missing)
+    except Exception as e:
+        logger.error(f"Error updating search index for {keys}: {str(e)}")
+
+def search_files(search_term: str, kind: str, tier: str = ACTIVE) -> List[str]:
+    """Ranked keys in one partition whose Firma, Name, Titel, Songidee, Lyrics or Werte match."""
+    scope = f"{tier}/{kind}/"
+    index = get_search_index()
+    index.sync(get_file_index(tier, kind).scan(), scope=scope)
+    return index.search(search_term, prefix=scope)
+
+def rank_by_search(items: List[tuple], search_term: str, kind: str, tier: str = ACTIVE) -> List[tuple]:
+    """Keep the (key, ...) tuples matching search_term, best match first."""
+    by_key = {item[0]: item for item in items}
+    return [by_key[k] for k in search_files(search_term, kind, tier) if k in by_key]
+
+@st.cache_resource
+def ensure_media_server():
+    """Start the range-capable audio server once per Streamlit process."""
+    return start_in_background()
+
+def media_base_url() -> Optional[str]:
+    """Where this browser reaches the media server, or None if it can't (MEDIA_HOST set to a local address).
+
+    Without MEDIA_BASE_URL the host the browser used for the Streamlit page is
+    taken, so remote browsers don't end up asking their own localhost.
+    """
+    if MEDIA_BASE_URL:
+        return MEDIA_BASE_URL
+    host = urlparse(f"//{st.context.headers.get('Host', 'localhost')}").hostname or 'localhost'
+    if is_local_bind() and host not in LOCAL_HOSTS:
+        return None
+    if ':' in host:
+        host = f"[{host}]"  # IPv6
+    return f"http://{host}:{MEDIA_PORT}"
+
+def download_link(label: str, root: str, relative_path: str) -> None:
+    """Download link to the media server; disabled if this browser can't reach it."""
+    base_url = media_base_url()
+    if base_url is not None:
+        st.link_button(label, media_url(root, relative_path, base_url, download=True))
+        return
+    # Originale nicht über den Streamlit-Websocket schicken
+    st.link_button(label, "#", disabled=True, help="Media-Server nur lokal erreichbar (MEDIA_HOST)")
+
+def paginate(items: List, key: str, page_size: int = PAGE_SIZE) -> List:
+    """Return the slice of items for the page selected in the widget with the given key."""
+    pages = max(1, (len(items) + page_size - 1) // page_size)
+    if pages == 1:
+        return items
+    page = st.number_input(
+        f"Seite (von {pages})",
+        min_value=1,
+        max_value=pages,
+        value=1,
+        key=f"page_{key}_{pages}"  # neue Seitenzahl (Suche, Archivieren) → zurück auf Seite 1
+    )
+    start = (page - 1) * page_size
+    st.caption(f"Einträge {start + 1}–{min(start + page_size, len(items))} von {len(items)}")
+    return items[start:start + page_size]
+
+def submit_song_job(file_path: str) -> None:
+    """Hand a pending Songidee to the job runner and return without waiting for the song."""
+    if JOB_RUNNER == "watcher":
+        return  # API.py bemerkt die geänderte Datei selbst
+    if not get_background_jobs().submit(file_path):
+        st.warning("Dieser Song wird bereits erstellt.")
+
+def job_progress(file_path: str) -> tuple:
+    """Return (label, fraction) for a pending job from its ledger entry and variants."""
+    ledger = get_ledger()
+    entry = ledger.get(file_path)
+    state = entry['state'] if entry and entry['state'] in (SUBMITTED, POLLING, DOWNLOADING) else None
+    label, fraction = JOB_STEPS[state]
+    if state:
+        minutes, seconds = divmod(int(time.time() - entry['created_at']), 60)
+        label += f" – seit {minutes}:{seconds:02d} min"
+    variants = ledger.variants(file_path) if state else []
+    if variants:
+        done = sum(1 for v in variants if v['state'] == DONE)
+        fraction = sum(JOB_STEPS.get(v['state'], JOB_STEPS[None])[1] for v in variants) / len(variants)
+        label += f" · {done} von {len(variants)} Varianten fertig"
+    return label, fraction
+
+@st.fragment(run_every=PROGRESS_REFRESH)
+def display_running_jobs() -> None:
+    """Live progress of all Songideen currently at Mureka; refreshes without rerunning the page."""
+    running = []
+    for song_file, _, data in load_indexed_files(SONGIDEEN):
+        songidee = first_record(data)
+        if songidee.get('Status') == PENDING_STATUS:
+            running.append((song_file, songidee.get('Titel', os.path.basename(song_file))))
+    
+    current = {song_file for song_file, _ in running}
+    finished = st.session_state.get('running_jobs', set()) - current
+    st.session_state.running_jobs = current
+    st.session_state.finished_jobs = st.session_state.get('finished_jobs', set()) | finished
+    
+    if not running and not st.session_state.finished_jobs:
+        return
+    
+    st.markdown("#### Songs in Arbeit")
+    for song_file, title in running:
+        file_path = str(path_of(song_file))
+        label, fraction = job_progress(file_path)
+        col_progress, col_action = st.columns([5, 1])
+        with col_progress:
+            st.progress(fraction, text=f"🎤 {title}: {label}")
+        with col_action:
+            # Nach einem Neustart von Streamlit läuft der Job nicht mehr – hier fortsetzen,
+            # sofern ihn nicht ein anderer Prozess (z. B. der Watcher) gerade bearbeitet
+            if (JOB_RUNNER != "watcher" and not get_background_jobs().is_running(file_path)
+                    and get_ledger().owner(file_path) is None):
+                if st.button("▶️ Fortsetzen", key=f"resume_{song_file}"):
+                    submit_song_job(file_path)
+    
+    for song_file in sorted(st.session_state.finished_jobs):
+        try:
+            songidee = first_record(load_indexed_file(song_file))
+        except Exception:
+            continue
+        if songidee.get('Status') == "fertig":
+            st.success(f"'{songidee.get('Titel', os.path.basename(song_file))}' ist fertig: {songidee.get('message', '')}")
+        else:
+            st.error(f"'{songidee.get('Titel', os.path.basename(song_file))}' fehlgeschlagen: {songidee.get('message', '')}")
+    if st.session_state.finished_jobs and st.button("🔄 Listen aktualisieren", key="refresh_finished_jobs"):
+        st.session_state.finished_jobs = set()
+        st.rerun(scope="app")
+
+def bulk_actions(items: List[tuple], key: str, label: Callable[[tuple], str],
+                 actions: Dict[str, Callable[[List[str]], int]]) -> None:
+    """Multi-select over all listed items plus one button per bulk action.
+
+    Each action receives all selected keys at once and returns how many it
+    handled; the page is rerun once afterwards instead of once per item.
+    """
+    result_key = f"bulk_result_{key}"
+    if result_key in st.session_state:
+        st.success(st.session_state.pop(result_key))
+    if not items or not st.toggle("Mehrfachauswahl", key=f"bulk_on_{key}"):
+        return
+    
+    # Neue Widget-Keys nach jeder Aktion leeren die Auswahl
+    generation = st.session_state.get(f"bulk_gen_{key}", 0)
+    options = [item[0] for item in items]
+    labels = {item[0]: label(item) for item in items}
+    if st.checkbox(f"Alle {len(options)} Einträge auswählen", key=f"bulk_all_{key}_{generation}"):
+        selected = options
+    else:
+        selected = st.multiselect(
+            "Auswahl",
+            options,
+            format_func=labels.get,
+            key=f"bulk_select_{key}_{generation}"
+        )
+    
+    for column, (button_label, action) in zip(st.columns(len(actions)), actions.items()):
+        with column:
+            if st.button(button_label, key=f"bulk_{key}_{button_label}", disabled=not selected, use_container_width=True):
+                done = action(selected)
+                logger.info(f"Bulk action '{button_label}' on {key}: {done} of {len(selected)} items")
+                st.session_state[f"bulk_gen_{key}"] = generation + 1
+                st.session_state[result_key] = f"{button_label}: {done} von {len(selected)} Einträgen erledigt"
+                st.rerun()
+
+def display_audio(root: str, relative_path: str, mime: str) -> None:
+    """Show the precomputed waveform and preview of a file, or the original if there is none yet.
+
+    If the browser can't reach the media server, only the small preview files
+    go through Streamlit, never the original.
+    """
+    sidecar = load_sidecar(os.path.join(MEDIA_ROOTS[root], relative_path))
+    base_url = media_base_url()
+    if base_url is None:
+        def source(root: str, relative_path: str) -> str:
+            return os.path.join(MEDIA_ROOTS[root], relative_path)
+    else:
+        def source(root: str, relative_path: str) -> str:
+            return media_url(root, relative_path, base_url)
+    if sidecar is None:
+        if base_url is None:
+            st.caption("Noch keine Vorschau vorhanden")
+        else:
+            st.audio(source(root, relative_path), format=mime)
+        return
+    st.image(source('previews', sidecar['waveform']), use_container_width=True)
+    st.audio(source('previews', sidecar['preview']), format='audio/mpeg')
+    minutes, seconds = divmod(int(sidecar['duration_s']), 60)
+    st.caption(
+        f"{minutes}:{seconds:02d} min · Spitze {sidecar['peak_dbfs']} dBFS · "
+        f"RMS {sidecar['rms_dbfs']} dBFS · Vorschau: erste {PREVIEW_SECONDS}s"
+    )
+
 def get_all_requests() -> List[Dict]:
     """Load all requests from JSON files."""
     requests = []
     try:
-        if os.path.exists(ANFRAGEN_DIR):
-            files = os.listdir(ANFRAGEN_DIR)
-            
-            for filename in files:
-                if filename.endswith('.json') and filename.startswith('Anfr_'):
-                    file_path = os.path.join(ANFRAGEN_DIR, filename)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            request = json.load(file)
-                            request['filename'] = filename
-                            requests.append(request)
-                    except Exception as e:
-                        st.error(f"Fehler beim Laden der Datei {filename}: {str(e)}")
-        else:
-            st.warning(f"Verzeichnis {ANFRAGEN_DIR} existiert nicht!")
+        for filename, _, request in load_indexed_files(ANFRAGEN):
+            requests.append({**request, 'filename': filename})
         
     except Exception as e:
         st.error(f"Fehler beim Laden der Anfragen: {str(e)}")
@@ -61,23 +322,21 @@ def get_all_requests() -> List[Dict]:
 def save_request(request: Dict) -> None:
     """Save single request to a JSON file."""
     try:
-        if not os.path.exists(ANFRAGEN_DIR):
-            os.makedirs(ANFRAGEN_DIR)
-            logger.info(f"Created directory: {ANFRAGEN_DIR}")
-            
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_firma = ''.join(c for c in request['Firma'] if c.isalnum() or c in [' ', '_', '-'])
         safe_firma = safe_firma.replace(' ', '_')
         filename = f"Anfr_{safe_firma}_{timestamp}.json"
         
-        file_path = os.path.join(ANFRAGEN_DIR, filename)
+        file_path = new_path(ANFRAGEN, request, filename)
         
         with open(file_path, 'w', encoding='utf-8') as file:
             json.dump(request, file, indent=4, ensure_ascii=False)
+        update_search_index(key_of(file_path))
+        get_ledger().record_stage("anfrage", DONE)
             
         if os.path.exists(file_path):
             logger.info(f"Successfully saved request for company: {request['Firma']}")
-            return filename
+            return key_of(file_path)
         logger.error(f"Failed to save request for company: {request['Firma']}")
         return None
     except Exception as e:
@@ -87,95 +346,77 @@ def save_request(request: Dict) -> None:
 
 def update_request_status(filename: str, new_status: str) -> None:
     """Update status of a specific request."""
-    try:
-        file_path = os.path.join(ANFRAGEN_DIR, filename)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            request = json.load(file)
-        
-        old_status = request.get('status', 'unknown')
-        request['status'] = new_status
-        
-        with open(file_path, 'w', encoding='utf-8') as file:
-            json.dump(request, file, indent=4, ensure_ascii=False)
+    set_request_status([filename], new_status)
+
+def set_request_status(filenames: List[str], new_status: str) -> int:
+    """Update the status of several requests; the search index is updated once for all."""
+    changed = []
+    for filename in filenames:
+        try:
+            file_path = path_of(filename)
+            with open(file_path, 'r', encoding='utf-8') as file:
+                request = json.load(file)
             
-        logger.info(f"Updated request status from '{old_status}' to '{new_status}' for file: {filename}")
-    except Exception as e:
-        logger.error(f"Error updating request status: {str(e)}")
-        st.error(f"Fehler beim Aktualisieren des Status: {str(e)}")
+            old_status = request.get('status', 'unknown')
+            request['status'] = new_status
+            
+            with open(file_path, 'w', encoding='utf-8') as file:
+                json.dump(request, file, indent=4, ensure_ascii=False)
+            changed.append(filename)
+                
+            logger.info(f"Updated request status from '{old_status}' to '{new_status}' for file: {filename}")
+        except Exception as e:
+            logger.error(f"Error updating request status: {str(e)}")
+            st.error(f"Fehler beim Aktualisieren des Status: {str(e)}")
+    update_search_index(*changed)
+    return len(changed)
 
-def get_requests_with_dates() -> List[tuple]:
+def get_requests_with_dates(tier: str = ACTIVE) -> List[tuple]:
     """Get requests with their creation dates, sorted by newest first."""
     try:
-        if not os.path.exists(ANFRAGEN_DIR):
-            return []
-            
-        files = os.listdir(ANFRAGEN_DIR)
-        requests = [f for f in files if f.endswith('.json') and f.startswith('Anfr_')]
-        
-        # Erstelle Liste mit (filename, creation_time, request_data)
-        requests_with_dates = []
-        for req_file in requests:
-            file_path = os.path.join(ANFRAGEN_DIR, req_file)
-            creation_time = os.path.getctime(file_path)
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    request_data = json.load(file)
-                    request_data['filename'] = req_file
-                    requests_with_dates.append((req_file, creation_time, request_data))
-            except Exception as e:
-                st.error(f"Fehler beim Laden der Datei {req_file}: {str(e)}")
-        
-        # Sortiere nach Erstellungsdatum (neueste zuerst)
-        requests_with_dates.sort(key=lambda x: x[1], reverse=True)
-        return requests_with_dates
+        # Liste mit (filename, creation_time, request_data); die Daten aus dem
+        # Index werden kopiert, damit 'filename' den Cache nicht verändert
+        return [
+            (req_file, creation_time, {**request_data, 'filename': req_file})
+            for req_file, creation_time, request_data in load_indexed_files(ANFRAGEN, tier)
+        ]
     except Exception as e:
         st.error(f"Fehler beim Laden der Anfragen: {str(e)}")
         return []
 
-def filter_requests(requests: List[tuple], search_term: str) -> List[tuple]:
+def filter_requests(requests: List[tuple], search_term: str, tier: str = ACTIVE) -> List[tuple]:
     """Filter requests based on search term."""
     if not search_term:
         return requests
     
-    search_term = search_term.lower()
-    filtered = []
-    for req_file, creation_time, request_data in requests:
-        if (search_term in request_data.get('Firma', '').lower() or 
-            search_term in request_data.get('Name', '').lower() or
-            search_term in req_file.lower()):
-            filtered.append((req_file, creation_time, request_data))
-    return filtered
+    return rank_by_search(requests, search_term, ANFRAGEN, tier)
+
+def move_stored_files(filenames: List[str], tier: str) -> int:
+    """Move several requests or Songideen to ``tier`` and re-index them in one pass."""
+    moved = []
+    for filename in filenames:
+        try:
+            moved += [filename, key_of(move_to(path_of(filename), tier))]
+        except Exception as e:
+            logger.error(f"Error moving {filename} to {tier}: {str(e)}")
+            action = "Archivieren" if tier == ARCHIVE else "Wiederherstellen"
+            st.error(f"Fehler beim {action} von {os.path.basename(filename)}: {str(e)}")
+    update_search_index(*moved)
+    return len(moved) // 2
 
 def archive_request(filename: str) -> bool:
-    """Archive a request by renaming with Archiv_ prefix."""
-    try:
-        old_path = os.path.join(ANFRAGEN_DIR, filename)
-        new_filename = filename.replace('Anfr_', 'Archiv_Anfr_')
-        new_path = os.path.join(ANFRAGEN_DIR, new_filename)
-        
-        os.rename(old_path, new_path)
+    """Archive a request by moving it to the archive tier."""
+    if move_stored_files([filename], ARCHIVE):
         logger.info(f"Successfully archived request: {filename}")
         return True
-    except Exception as e:
-        logger.error(f"Error archiving request {filename}: {str(e)}")
-        st.error(f"Fehler beim Archivieren: {str(e)}")
-        return False
+    return False
 
 def restore_request(filename: str) -> bool:
-    """Restore an archived request by removing Archiv_ prefix."""
-    try:
-        old_path = os.path.join(ANFRAGEN_DIR, filename)
-        new_filename = filename.replace('Archiv_Anfr_', 'Anfr_')
-        new_path = os.path.join(ANFRAGEN_DIR, new_filename)
-        
-        os.rename(old_path, new_path)
+    """Restore an archived request by moving it back to the active tier."""
+    if move_stored_files([filename], ACTIVE):
         logger.info(f"Successfully restored request from archive: {filename}")
         return True
-    except Exception as e:
-        logger.error(f"Error restoring request {filename}: {str(e)}")
-        st.error(f"Fehler beim Wiederherstellen: {str(e)}")
-        return False
+    return False
 
 def validate_url(url: str) -> str:
     """Validate and clean URL."""
@@ -370,7 +611,7 @@ def display_approval_section():
                 search_term = st.text_input(
                     "Anfrage suchen:",
                     value=st.session_state.requests_search,
-                    placeholder="Firma, Name oder Dateiname eingeben...",
+                    placeholder="Firma, Name, Werte oder Dateiname eingeben...",
                     key="current_requests_search"
                 )
             
@@ -388,6 +629,18 @@ def display_approval_section():
             if search_term:
                 st.markdown(f"*{len(filtered_requests)} Anfrage(n) gefunden für '{search_term}'*")
             
+            bulk_actions(
+                filtered_requests,
+                'requests',
+                lambda item: f"{item[2].get('Firma', 'Unbekannte Firma')} - {item[2].get('Name', 'Unbekannter Name')}",
+                {
+                    "✅ Freigeben": lambda files: set_request_status(files, 'freigegeben'),
+                    "🔄 In Bearbeitung": lambda files: set_request_status(files, 'in Bearbeitung'),
+                    "❌ Ablehnen": lambda files: set_request_status(files, 'abgelehnt'),
+                    "📦 Archivieren": lambda files: move_stored_files(files, ARCHIVE),
+                }
+            )
+            
             if not filtered_requests:
                 if search_term:
                     st.info("Keine Anfragen gefunden, die dem Suchbegriff entsprechen.")
@@ -395,7 +648,7 @@ def display_approval_section():
                     st.info("Keine Anfragen vorhanden.")
             else:
                 # Zeige Anfragen
-                for req_file, creation_time, request in filtered_requests:
+                for req_file, creation_time, request in paginate(filtered_requests, 'requests'):
                     creation_date = datetime.fromtimestamp(creation_time).strftime("%d.%m.%Y %H:%M")
                     status = request.get('status', 'ausstehend')
                     
@@ -417,24 +670,32 @@ def display_approval_section():
                             st.markdown("#### Unternehmensdetails")
                             st.write(f"**Firma:** {request.get('Firma', '')}")
                             st.write(f"**Name:** {request.get('Name', '')}")
-                            st.write(f"**Website:** {request.get('Website', 'Keine Website angegeben')}")
-                            st.write(f"**E-Mail:** {request.get('Email', '')}")
-                            st.write(f"**Telefon:** {request.get('Telefon', 'Nicht angegeben')}")
-                            
-                            st.markdown("#### Unternehmensprofil")
-                            st.write(f"**Werte und Inhalte:** {request.get('Werte', '')}")
-                            st.write(f"**Abgrenzung zur Konkurrenz:** {request.get('Konkurrenz', '')}")
-                            st.write(f"**Unternehmensphilosophie:** {request.get('Philosophie', '')}")
                             
-                            st.markdown("#### Musikpräferenzen")
-                            st.write(f"**Musikstil Präferenz:** {request.get('Musik_Praeferenz', '')}")
-                            st.write(f"**Gewünschter Musikstil:** {request.get('Musik_Firmensong', '')}")
-                            st.write(f"**Ausrichtung:** {request.get('Ausrichtung', '')}")
-                            st.write(f"**Songlänge:** {request.get('Songlaenge', '')}")
-                            
-                            if request.get('Sonstiges', ''):
-                                st.markdown("#### Sonstiges")
-                                st.write(request.get('Sonstiges', ''))
+                            # Restliche Angaben erst aufbauen, wenn sie geöffnet werden
+                            details_key = f"details_{req_file}"
+                            if details_key not in st.session_state:
+                                st.session_state[details_key] = False
+                            if st.button("Vollständige Details anzeigen", key=f"btn_{req_file}"):
+                                st.session_state[details_key] = not st.session_state[details_key]
+                            if st.session_state[details_key]:
+                                st.write(f"**Website:** {request.get('Website', 'Keine Website angegeben')}")
+                                st.write(f"**E-Mail:** {request.get('Email', '')}")
+                                st.write(f"**Telefon:** {request.get('Telefon', 'Nicht angegeben')}")
+                                
+                                st.markdown("#### Unternehmensprofil")
+                                st.write(f"**Werte und Inhalte:** {request.get('Werte', '')}")
+                                st.write(f"**Abgrenzung zur Konkurrenz:** {request.get('Konkurrenz', '')}")
+                                st.write(f"**Unternehmensphilosophie:** {request.get('Philosophie', '')}")
+                                
+                                st.markdown("#### Musikpräferenzen")
+                                st.write(f"**Musikstil Präferenz:** {request.get('Musik_Praeferenz', '')}")
+                                st.write(f"**Gewünschter Musikstil:** {request.get('Musik_Firmensong', '')}")
+                                st.write(f"**Ausrichtung:** {request.get('Ausrichtung', '')}")
+                                st.write(f"**Songlänge:** {request.get('Songlaenge', '')}")
+                                
+                                if request.get('Sonstiges', ''):
+                                    st.markdown("#### Sonstiges")
+                                    st.write(request.get('Sonstiges', ''))
                         
                         with col_status:
                             st.markdown("#### Status & Aktionen")
@@ -481,7 +742,7 @@ def display_approval_section():
             with col_archive_search:
                 archive_search_term = st.text_input(
                     "Archivierte Anfragen suchen:",
-                    placeholder="Firma, Name oder Dateiname eingeben...",
+                    placeholder="Firma, Name, Werte oder Dateiname eingeben...",
                     key="archive_requests_search"
                 )
             
@@ -491,36 +752,26 @@ def display_approval_section():
             
             # Lade archivierte Anfragen
             try:
-                files = os.listdir(ANFRAGEN_DIR)
-                archived_requests = [f for f in files if f.endswith('.json') and f.startswith('Archiv_Anfr_')]
-                
-                # Erstelle Liste mit Daten für archivierte Anfragen
-                archived_with_dates = []
-                for req_file in archived_requests:
-                    file_path = os.path.join(ANFRAGEN_DIR, req_file)
-                    creation_time = os.path.getctime(file_path)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            request_data = json.load(file)
-                            request_data['filename'] = req_file
-                            archived_with_dates.append((req_file, creation_time, request_data))
-                    except Exception as e:
-                        st.error(f"Fehler beim Laden der Datei {req_file}: {str(e)}")
-                
-                archived_with_dates.sort(key=lambda x: x[1], reverse=True)
-                filtered_archived = filter_requests(archived_with_dates, archive_search_term)
+                archived_with_dates = get_requests_with_dates(ARCHIVE)
+                filtered_archived = filter_requests(archived_with_dates, archive_search_term, ARCHIVE)
                 
                 if archive_search_term:
                     st.markdown(f"*{len(filtered_archived)} archivierte Anfrage(n) gefunden für '{archive_search_term}'*")
                 
+                bulk_actions(
+                    filtered_archived,
+                    'archived_requests',
+                    lambda item: f"{item[2].get('Firma', 'Unbekannte Firma')} - {item[2].get('Name', 'Unbekannter Name')}",
+                    {"🔄 Wiederherstellen": lambda files: move_stored_files(files, ACTIVE)}
+                )
+                
                 if not filtered_archived:
                     if archive_search_term:
                         st.info("Keine archivierten Anfragen gefunden, die dem Suchbegriff entsprechen.")
                     else:
                         st.info("Keine archivierten Anfragen vorhanden.")
                 else:
-                    for req_file, creation_time, request in filtered_archived:
+                    for req_file, creation_time, request in paginate(filtered_archived, 'archived_requests'):
                         creation_date = datetime.fromtimestamp(creation_time).strftime("%d.%m.%Y %H:%M")
                         status = request.get('status', 'ausstehend')
                         
@@ -561,85 +812,190 @@ def display_approval_section():
 def save_songidee(filename: str, songidee: Dict) -> None:
     """Save edited songidee back to file."""
     try:
-        file_path = os.path.join(ANFRAGEN_DIR, filename)
+        file_path = path_of(filename)
         with open(file_path, 'w', encoding='utf-8') as file:
             json.dump(songidee, file, indent=4, ensure_ascii=False)
+        update_search_index(filename)
         st.success("Änderungen wurden erfolgreich gespeichert!")
     except Exception as e:
         st.error(f"Fehler beim Speichern: {str(e)}")
 
-def get_songideen_with_dates() -> List[tuple]:
+def get_songideen_with_dates(tier: str = ACTIVE) -> List[tuple]:
     """Get songideen with their creation dates, sorted by newest first."""
     try:
-        if not os.path.exists(ANFRAGEN_DIR):
-            return []
-            
-        files = os.listdir(ANFRAGEN_DIR)
-        songideen = [f for f in files if f.endswith('.json') and f.startswith('Song_')]
-        
         # Erstelle Liste mit (filename, creation_time, title)
         songideen_with_dates = []
-        for song_file in songideen:
-            file_path = os.path.join(ANFRAGEN_DIR, song_file)
-            creation_time = os.path.getctime(file_path)
-            
-            # Versuche Titel aus der JSON-Datei zu lesen
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    songidee_data = json.load(file)
-                    if isinstance(songidee_data, list) and songidee_data:
-                        title = songidee_data[0].get('Titel', song_file.replace('.json', '').replace('Song_', ''))
-                    else:
-                        title = song_file.replace('.json', '').replace('Song_', '')
-            except:
-                title = song_file.replace('.json', '').replace('Song_', '')
-            
+        for song_file, creation_time, songidee_data in load_indexed_files(SONGIDEEN, tier):
+            fallback_title = os.path.basename(song_file).replace('.json', '').replace('Song_', '')
+            title = first_record(songidee_data).get('Titel', fallback_title)
             songideen_with_dates.append((song_file, creation_time, title))
-        
-        # Sortiere nach Erstellungsdatum (neueste zuerst)
-        songideen_with_dates.sort(key=lambda x: x[1], reverse=True)
         return songideen_with_dates
     except Exception as e:
         st.error(f"Fehler beim Laden der Songideen: {str(e)}")
         return []
 
-def filter_songideen(songideen: List[tuple], search_term: str) -> List[tuple]:
+def filter_songideen(songideen: List[tuple], search_term: str, tier: str = ACTIVE) -> List[tuple]:
     """Filter songideen based on search term."""
     if not search_term:
         return songideen
     
-    search_term = search_term.lower()
-    filtered = []
-    for song_file, creation_time, title in songideen:
-        if search_term in title.lower() or search_term in song_file.lower():
-            filtered.append((song_file, creation_time, title))
-    return filtered
+    return rank_by_search(songideen, search_term, SONGIDEEN, tier)
 
 def archive_songidee(filename: str) -> bool:
-    """Archive a songidee by renaming with Archiv_ prefix."""
-    try:
-        old_path = os.path.join(ANFRAGEN_DIR, filename)
-        new_filename = filename.replace('Song_', 'Archiv_Song_')
-        new_path = os.path.join(ANFRAGEN_DIR, new_filename)
-        
-        os.rename(old_path, new_path)
-        return True
-    except Exception as e:
-        st.error(f"Fehler beim Archivieren: {str(e)}")
-        return False
+    """Archive a songidee by moving it to the archive tier."""
+    return move_stored_files([filename], ARCHIVE) == 1
 
 def restore_songidee(filename: str) -> bool:
-    """Restore an archived songidee by removing Archiv_ prefix."""
-    try:
-        old_path = os.path.join(ANFRAGEN_DIR, filename)
-        new_filename = filename.replace('Archiv_Song_', 'Song_')
-        new_path = os.path.join(ANFRAGEN_DIR, new_filename)
+    """Restore an archived songidee by moving it back to the active tier."""
+    return move_stored_files([filename], ACTIVE) == 1
+
+def display_songidee_form(song_file: str, title: str, songidee: Dict) -> None:
+    """Edit form of one Songidee with the save, create-song and archive actions."""
+    file_path = path_of(song_file)
+    
+    # Editierbare Felder
+    with st.form(f"edit_songidee_form_{song_file}"):
+        edited_titel = st.text_input(
+            "Titel",
+            value=songidee.get('Titel', title),
+            help="Dieser Titel wird für die MP3-Datei verwendet",
+            key=f"titel_{song_file}"
+        )
         
-        os.rename(old_path, new_path)
-        return True
-    except Exception as e:
-        st.error(f"Fehler beim Wiederherstellen: {str(e)}")
-        return False
+        edited_firma = st.text_input(
+            "Firma",
+            value=songidee.get('Firma', ''),
+            key=f"firma_{song_file}"
+        )
+        
+        edited_songidee = st.text_area(
+            "Songidee",
+            value=songidee.get('Songidee', ''),
+            height=200,
+            key=f"songidee_{song_file}"
+        )
+        
+        edited_begruendung = st.text_area(
+            "Begründung",
+            value=songidee.get('Begründung', ''),
+            height=150,
+            key=f"begruendung_{song_file}"
+        )
+        
+        edited_lyrics = st.text_area(
+            "Lyrics",
+            value=songidee.get('Lyrics', ''),
+            height=200,
+            key=f"lyrics_{song_file}"
+        )
+        
+        edited_description = st.text_area(
+            "Description",
+            value=songidee.get('Description', ''),
+            height=100,
+            key=f"description_{song_file}"
+        )
+        
+        edited_status = st.text_input(
+            "Status",
+            value=songidee.get('Status', ''),
+            key=f"status_{song_file}"
+        )
+        
+        force_variant = st.checkbox(
+            "Neue Variante erzwingen",
+            help="Auch bei unveränderten Lyrics/Description einen neuen Song generieren statt den vorhandenen zu verwenden",
+            key=f"force_variant_{song_file}"
+        )
+        
+        col_variants, col_keep = st.columns(2)
+        with col_variants:
+            variant_count = st.number_input(
+                "Anzahl Varianten",
+                min_value=1,
+                max_value=20,
+                value=1,
+                help="So viele Songs werden gleichzeitig bei Mureka generiert",
+                key=f"variant_count_{song_file}"
+            )
+        with col_keep:
+            variant_keep = st.number_input(
+                "Fertig nach Varianten",
+                min_value=0,
+                max_value=20,
+                value=0,
+                help="Restliche Varianten verwerfen, sobald so viele fertig sind (0 = alle abwarten)",
+                key=f"variant_keep_{song_file}"
+            )
+        
+        # Drei Buttons nebeneinander
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            submit_button = st.form_submit_button("💾 Speichern")
+        with col2:
+            create_song_button = st.form_submit_button("🎤 Song erstellen")
+        with col3:
+            archive_button = st.form_submit_button("📦 Archivieren")
+        
+        if submit_button:
+            updated_songidee = [{
+                'Titel': edited_titel,
+                'Firma': edited_firma,
+                'Songidee': edited_songidee,
+                'Begründung': edited_begruendung,
+                'Lyrics': edited_lyrics,
+                'Description': edited_description,
+                'Status': edited_status
+            }]
+            
+            try:
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    json.dump(updated_songidee, file, indent=2, ensure_ascii=False)
+                update_search_index(song_file)
+                st.success("Änderungen wurden erfolgreich gespeichert!")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Fehler beim Speichern der Änderungen: {str(e)}")
+                
+        if create_song_button:
+            if not edited_titel.strip():
+                st.error("Bitte geben Sie einen Titel ein, bevor Sie den Song erstellen.")
+            else:
+                updated_songidee = [{
+                    'Titel': edited_titel,
+                    'Firma': edited_firma,
+                    'Songidee': edited_songidee,
+                    'Begründung': edited_begruendung,
+                    'Lyrics': edited_lyrics,
+                    'Description': edited_description,
+                    'Status': "An Mureka weitergegeben"
+                }]
+                if force_variant:
+                    updated_songidee[0]['force_new_variant'] = True
+                if variant_count > 1:
+                    updated_songidee[0]['variant_count'] = int(variant_count)
+                    if variant_keep:
+                        updated_songidee[0]['variant_keep'] = int(variant_keep)
+                
+                try:
+                    with open(file_path, 'w', encoding='utf-8') as file:
+                        json.dump(updated_songidee, file, indent=2, ensure_ascii=False)
+                    update_search_index(song_file)
+                        
+                    # Convert to absolute path if it's not already
+                    abs_file_path = os.path.abspath(file_path)
+                    submit_song_job(abs_file_path)
+                    logger.info(f"Submitted song job for file: {file_path} (runner: {JOB_RUNNER})")
+                    st.success("Song wurde an Mureka weitergegeben!")
+                    st.rerun()
+                except Exception as e:
+                    logger.error(f"Error submitting song job for file {file_path}: {str(e)}")
+                    st.error(f"Fehler beim Weitergeben des Songs: {str(e)}")
+        
+        if archive_button:
+            if archive_songidee(song_file):
+                st.success(f"'{title}' wurde archiviert!")
+                st.rerun()
 
 def display_songideen_section():
     """Display and handle the songideen section."""
@@ -649,6 +1005,8 @@ def display_songideen_section():
     if 'songideen_search' not in st.session_state:
         st.session_state.songideen_search = ""
     
+    display_running_jobs()
+    
     try:
         # Tabs für aktuelle Songideen und Archiv
         tab1, tab2 = st.tabs(["Aktuelle Songideen", "Archiv"])
@@ -663,7 +1021,7 @@ def display_songideen_section():
                 search_term = st.text_input(
                     "Songidee suchen:",
                     value=st.session_state.songideen_search,
-                    placeholder="Titel oder Dateiname eingeben...",
+                    placeholder="Titel, Firma, Songidee oder Lyrics eingeben...",
                     key="current_songideen_search"
                 )
             
@@ -681,6 +1039,13 @@ def display_songideen_section():
             if search_term:
                 st.markdown(f"*{len(filtered_songideen)} Songidee(n) gefunden für '{search_term}'*")
             
+            bulk_actions(
+                filtered_songideen,
+                'songideen',
+                lambda item: item[2],
+                {"📦 Archivieren": lambda files: move_stored_files(files, ARCHIVE)}
+            )
+            
             if not filtered_songideen:
                 if search_term:
                     st.info("Keine Songideen gefunden, die dem Suchbegriff entsprechen.")
@@ -688,127 +1053,25 @@ def display_songideen_section():
                     st.info("Keine Songideen vorhanden.")
             else:
                 # Zeige Songideen
-                for song_file, creation_time, title in filtered_songideen:
+                for song_file, creation_time, title in paginate(filtered_songideen, 'songideen'):
                     creation_date = datetime.fromtimestamp(creation_time).strftime("%d.%m.%Y %H:%M")
                     
                     # Erweiterbarer Container für jede Songidee
                     with st.expander(f"🎵 {title} - *{creation_date}*"):
-                        file_path = os.path.join(ANFRAGEN_DIR, song_file)
                         try:
-                            with open(file_path, 'r', encoding='utf-8') as file:
-                                songideen_list = json.load(file)
-                                songidee = songideen_list[0] if isinstance(songideen_list, list) else songideen_list
+                            songidee = first_record(load_indexed_file(song_file))
                             
-                            # Editierbare Felder
-                            with st.form(f"edit_songidee_form_{song_file}"):
-                                edited_titel = st.text_input(
-                                    "Titel",
-                                    value=songidee.get('Titel', title),
-                                    help="Dieser Titel wird für die MP3-Datei verwendet",
-                                    key=f"titel_{song_file}"
-                                )
-                                
-                                edited_firma = st.text_input(
-                                    "Firma",
-                                    value=songidee.get('Firma', ''),
-                                    key=f"firma_{song_file}"
-                                )
-                                
-                                edited_songidee = st.text_area(
-                                    "Songidee",
-                                    value=songidee.get('Songidee', ''),
-                                    height=200,
-                                    key=f"songidee_{song_file}"
-                                )
-                                
-                                edited_begruendung = st.text_area(
-                                    "Begründung",
-                                    value=songidee.get('Begründung', ''),
-                                    height=150,
-                                    key=f"begruendung_{song_file}"
-                                )
-                                
-                                edited_lyrics = st.text_area(
-                                    "Lyrics",
-                                    value=songidee.get('Lyrics', ''),
-                                    height=200,
-                                    key=f"lyrics_{song_file}"
-                                )
-                                
-                                edited_description = st.text_area(
-                                    "Description",
-                                    value=songidee.get('Description', ''),
-                                    height=100,
-                                    key=f"description_{song_file}"
-                                )
-                                
-                                edited_status = st.text_input(
-                                    "Status",
-                                    value=songidee.get('Status', ''),
-                                    key=f"status_{song_file}"
-                                )
-                                
-                                # Drei Buttons nebeneinander
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    submit_button = st.form_submit_button("💾 Speichern")
-                                with col2:
-                                    create_song_button = st.form_submit_button("🎤 Song erstellen")
-                                with col3:
-                                    archive_button = st.form_submit_button("📦 Archivieren")
-                                
-                                if submit_button:
-                                    updated_songidee = [{
-                                        'Titel': edited_titel,
-                                        'Firma': edited_firma,
-                                        'Songidee': edited_songidee,
-                                        'Begründung': edited_begruendung,
-                                        'Lyrics': edited_lyrics,
-                                        'Description': edited_description,
-                                        'Status': edited_status
-                                    }]
-                                    
-                                    try:
-                                        with open(file_path, 'w', encoding='utf-8') as file:
-                                            json.dump(updated_songidee, file, indent=2, ensure_ascii=False)
-                                        st.success("Änderungen wurden erfolgreich gespeichert!")
-                                        st.rerun()
-                                    except Exception as e:
-                                        st.error(f"Fehler beim Speichern der Änderungen: {str(e)}")
-                                        
-                                if create_song_button:
-                                    if not edited_titel.strip():
-                                        st.error("Bitte geben Sie einen Titel ein, bevor Sie den Song erstellen.")
-                                    else:
-                                        updated_songidee = [{
-                                            'Titel': edited_titel,
-                                            'Firma': edited_firma,
-                                            'Songidee': edited_songidee,
-                                            'Begründung': edited_begruendung,
-                                            'Lyrics': edited_lyrics,
-                                            'Description': edited_description,
-                                            'Status': "An Mureka weitergegeben"
-                                        }]
-                                        
-                                        try:
-                                            with open(file_path, 'w', encoding='utf-8') as file:
-                                                json.dump(updated_songidee, file, indent=2, ensure_ascii=False)
-                                                
-                                            logger.info(f"Starting song processing for file: {file_path}")
-                                            # Convert to absolute path if it's not already
-                                            abs_file_path = os.path.abspath(file_path)
-                                            process_job(abs_file_path)
-                                            logger.info(f"Successfully processed song job for file: {file_path}")
-                                            st.success("Song wurde an Mureka weitergegeben!")
-                                            st.rerun()
-                                        except Exception as e:
-                                            logger.error(f"Error processing song job for file {file_path}: {str(e)}")
-                                            st.error(f"Fehler beim Weitergeben des Songs: {str(e)}")
-                                
-                                if archive_button:
-                                    if archive_songidee(song_file):
-                                        st.success(f"'{title}' wurde archiviert!")
-                                        st.rerun()
+                            # Das Formular erst aufbauen, wenn die Songidee geöffnet wird
+                            edit_key = f"edit_{song_file}"
+                            if edit_key not in st.session_state:
+                                st.session_state[edit_key] = False
+                            if st.button("✏️ Bearbeiten", key=f"btn_edit_{song_file}"):
+                                st.session_state[edit_key] = not st.session_state[edit_key]
+                            if st.session_state[edit_key]:
+                                display_songidee_form(song_file, title, songidee)
+                            else:
+                                st.write(f"**Firma:** {songidee.get('Firma', '')}")
+                                st.write(f"**Status:** {songidee.get('Status', '')}")
                             
                         except Exception as e:
                             st.error(f"Fehler beim Laden der Datei {song_file}: {str(e)}")
@@ -822,7 +1085,7 @@ def display_songideen_section():
             with col_archive_search:
                 archive_search_term = st.text_input(
                     "Archivierte Songideen suchen:",
-                    placeholder="Titel oder Dateiname eingeben...",
+                    placeholder="Titel, Firma, Songidee oder Lyrics eingeben...",
                     key="archive_songideen_search"
                 )
             
@@ -832,40 +1095,26 @@ def display_songideen_section():
             
             # Lade archivierte Songideen
             try:
-                files = os.listdir(ANFRAGEN_DIR)
-                archived_songideen = [f for f in files if f.endswith('.json') and f.startswith('Archiv_Song_')]
-                
-                # Erstelle Liste mit Daten für archivierte Songideen
-                archived_with_dates = []
-                for song_file in archived_songideen:
-                    file_path = os.path.join(ANFRAGEN_DIR, song_file)
-                    creation_time = os.path.getctime(file_path)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            songidee_data = json.load(file)
-                            if isinstance(songidee_data, list) and songidee_data:
-                                title = songidee_data[0].get('Titel', song_file.replace('.json', '').replace('Archiv_Song_', ''))
-                            else:
-                                title = song_file.replace('.json', '').replace('Archiv_Song_', '')
-                    except:
-                        title = song_file.replace('.json', '').replace('Archiv_Song_', '')
-                    
-                    archived_with_dates.append((song_file, creation_time, title))
-                
-                archived_with_dates.sort(key=lambda x: x[1], reverse=True)
-                filtered_archived = filter_songideen(archived_with_dates, archive_search_term)
+                archived_with_dates = get_songideen_with_dates(ARCHIVE)
+                filtered_archived = filter_songideen(archived_with_dates, archive_search_term, ARCHIVE)
                 
                 if archive_search_term:
                     st.markdown(f"*{len(filtered_archived)} archivierte Songidee(n) gefunden für '{archive_search_term}'*")
                 
+                bulk_actions(
+                    filtered_archived,
+                    'archived_songideen',
+                    lambda item: item[2],
+                    {"Wiederherstellen": lambda files: move_stored_files(files, ACTIVE)}
+                )
+                
                 if not filtered_archived:
                     if archive_search_term:
                         st.info("Keine archivierten Songideen gefunden, die dem Suchbegriff entsprechen.")
                     else:
                         st.info("Keine archivierten Songideen vorhanden.")
                 else:
-                    for song_file, creation_time, title in filtered_archived:
+                    for song_file, creation_time, title in paginate(filtered_archived, 'archived_songideen'):
                         creation_date = datetime.fromtimestamp(creation_time).strftime("%d.%m.%Y %H:%M")
                         
                         with st.expander(f"📦 {title} - *{creation_date}*"):
@@ -880,11 +1129,8 @@ def display_songideen_section():
                             if st.button("Vollständige Details anzeigen", key=f"btn_{song_file}"):
                                 st.session_state[details_key] = not st.session_state[details_key]
                             if st.session_state[details_key]:
-                                file_path = os.path.join(ANFRAGEN_DIR, song_file)
                                 try:
-                                    with open(file_path, 'r', encoding='utf-8') as file:
-                                        songideen_list = json.load(file)
-                                        songidee = songideen_list[0] if isinstance(songideen_list, list) else songideen_list
+                                    songidee = first_record(load_indexed_file(song_file))
                                     
                                     st.text_area("Songidee", songidee.get('Songidee', ''), disabled=True, key=f"arch_songidee_{song_file}")
                                     st.text_area("Begründung", songidee.get('Begründung', ''), disabled=True, key=f"arch_begruendung_{song_file}")
@@ -916,6 +1162,7 @@ def move_song_to_archive(song_filename: str) -> bool:
         
         # Verschiebe die Datei
         os.rename(source_path, dest_path)
+        relocate_preview(source_path, dest_path)
         logger.info(f"Successfully archived song: {song_filename}")
         return True
     except Exception as e:
@@ -934,6 +1181,7 @@ def move_song_from_archive(song_filename: str) -> bool:
         
         # Verschiebe die Datei zurück
         os.rename(source_path, dest_path)
+        relocate_preview(source_path, dest_path)
         logger.info(f"Successfully restored song from archive: {song_filename}")
         return True
     except Exception as e:
@@ -941,6 +1189,11 @@ def move_song_from_archive(song_filename: str) -> bool:
         st.error(f"Fehler beim Wiederherstellen: {str(e)}")
         return False
 
+def move_songs(song_filenames: List[str], to_archive: bool) -> int:
+    """Archive or restore several songs (with their previews) before a single rerun."""
+    move = move_song_to_archive if to_archive else move_song_from_archive
+    return sum(1 for song in song_filenames if move(song))
+
 def get_songs_with_dates(directory: str) -> List[tuple]:
     """Get songs with their creation dates, sorted by newest first."""
     try:
@@ -985,7 +1238,14 @@ def display_song_list(songs: List[tuple], directory: str, is_archive: bool = Fal
             st.info("Keine Songs im Output-Ordner vorhanden.")
         return
     
-    for song, creation_time in songs:
+    bulk_actions(
+        songs,
+        f"songs_{is_archive}",
+        lambda item: item[0].replace('.mp3', '').replace('_', ' '),
+        {"Wiederherstellen" if is_archive else "Archivieren": lambda files: move_songs(files, not is_archive)}
+    )
+    
+    for song, creation_time in paginate(songs, f"songs_{is_archive}"):
         with st.container():
             # Zeige Erstellungsdatum
             creation_date = datetime.fromtimestamp(creation_time).strftime("%d.%m.%Y %H:%M")
@@ -995,36 +1255,29 @@ def display_song_list(songs: List[tuple], directory: str, is_archive: bool = Fal
             # Layout: Player, Download, Archive/Restore Button
             col1, col2, col3 = st.columns([4, 1, 1])
             
-            audio_path = os.path.join(directory, song)
-            with open(audio_path, 'rb') as audio_file:
-                audio_bytes = audio_file.read()
-                
-                # MP3-Player
-                with col1:
-                    st.audio(audio_bytes, format='audio/mp3')
-                
-                # Download-Button
-                with col2:
-                    st.download_button(
-                        label="⬇️ Download",
-                        data=audio_bytes,
-                        file_name=song,
-                        mime="audio/mpeg",
-                        key=f"download_{song}_{is_archive}"
-                    )
-                
-                # Archive/Restore Button
-                with col3:
-                    if is_archive:
-                        if st.button("Wiederherstellen", key=f"restore_{song}"):
-                            if move_song_from_archive(song):
-                                st.success(f"'{song}' wurde wiederhergestellt!")
-                                st.rerun()
-                    else:
-                        if st.button("Archivieren", key=f"archive_{song}"):
-                            if move_song_to_archive(song):
-                                st.success(f"'{song}' wurde archiviert!")
-                                st.rerun()
+            # Der Browser streamt die Datei per Range-Request vom Media-Server
+            audio_path = os.path.relpath(os.path.join(directory, song), MEDIA_ROOTS['output'])
+            
+            # MP3-Player
+            with col1:
+                display_audio('output', audio_path, 'audio/mpeg')
+            
+            # Download-Button
+            with col2:
+                download_link("⬇️ Download", 'output', audio_path)
+            
+            # Archive/Restore Button
+            with col3:
+                if is_archive:
+                    if st.button("Wiederherstellen", key=f"restore_{song}"):
+                        if move_song_from_archive(song):
+                            st.success(f"'{song}' wurde wiederhergestellt!")
+                            st.rerun()
+                else:
+                    if st.button("Archivieren", key=f"archive_{song}"):
+                        if move_song_to_archive(song):
+                            st.success(f"'{song}' wurde archiviert!")
+                            st.rerun()
             
             st.divider()
 
@@ -1150,7 +1403,7 @@ def display_david_style_song_list(songs: List[tuple]):
         st.info("Keine David-Style Songs im voicecloned-Ordner vorhanden.")
         return
     
-    for song, creation_time in songs:
+    for song, creation_time in paginate(songs, "david_style"):
         with st.container():
             # Zeige Erstellungsdatum
             creation_date = datetime.fromtimestamp(creation_time).strftime("%d.%m.%Y %H:%M")
@@ -1160,26 +1413,13 @@ def display_david_style_song_list(songs: List[tuple]):
             # Layout: Player und Download Button
             col1, col2 = st.columns([4, 1])
             
-            audio_path = os.path.join("/proj/voicecloned", song)
-            try:
-                with open(audio_path, 'rb') as audio_file:
-                    audio_bytes = audio_file.read()
-                    
-                    # MP3-Player
-                    with col1:
-                        st.audio(audio_bytes, format='audio/mp3')
-                    
-                    # Download-Button
-                    with col2:
-                        st.download_button(
-                            label="⬇️ Download",
-                            data=audio_bytes,
-                            file_name=song,
-                            mime="audio/mpeg",
-                            key=f"download_david_{song}"
-                        )
-            except Exception as e:
-                st.error(f"Fehler beim Laden der Datei {song}: {str(e)}")
+            # MP3-Player
+            with col1:
+                display_audio('voicecloned', song, 'audio/mpeg')
+            
+            # Download-Button
+            with col2:
+                download_link("⬇️ Download", 'voicecloned', song)
             
             st.divider()
 
@@ -1268,7 +1508,7 @@ def display_vocals_only_song_list(songs: List[tuple]):
         st.info("Keine Stems im vocals_only-Ordner vorhanden.")
         return
     
-    for song_name, creation_time, vocals_file, no_vocals_file in songs:
+    for song_name, creation_time, vocals_file, no_vocals_file in paginate(songs, "vocals_only"):
         # Create a container with border styling
         st.markdown(f"""
         <div style="
@@ -1290,20 +1530,13 @@ def display_vocals_only_song_list(songs: List[tuple]):
             st.markdown("**Geklonte Stimme (vocals_rvc.wav)**")
             try:
                 if os.path.exists(vocals_file):
-                    with open(vocals_file, 'rb') as audio_file:
-                        audio_bytes = audio_file.read()
-                        
-                        # Audio Player
-                        st.audio(audio_bytes, format='audio/wav')
-                        
-                        # Download Button
-                        st.download_button(
-                            label="Download geklonte Stimme",
-                            data=audio_bytes,
-                            file_name=f"{song_name}_vocals_rvc.wav",
-                            mime="audio/wav",
-                            key=f"download_vocals_rvc_{song_name}"
-                        )
+                    stem_path = f"{song_name}/vocals_rvc.wav"
+                    
+                    # Vorschau statt der großen WAV (lädt erst beim Abspielen)
+                    display_audio('stems', stem_path, 'audio/wav')
+                    
+                    # Download Button
+                    download_link("Download geklonte Stimme", 'stems', stem_path)
                 else:
                     st.error("vocals_rvc.wav nicht gefunden")
             except Exception as e:
@@ -1314,20 +1547,13 @@ def display_vocals_only_song_list(songs: List[tuple]):
             st.markdown("**Instrumente (no_vocals.wav)**")
             try:
                 if os.path.exists(no_vocals_file):
-                    with open(no_vocals_file, 'rb') as audio_file:
-                        audio_bytes = audio_file.read()
-                        
-                        # Audio Player
-                        st.audio(audio_bytes, format='audio/wav')
-                        
-                        # Download Button
-                        st.download_button(
-                            label="Download Instrumente",
-                            data=audio_bytes,
-                            file_name=f"{song_name}_no_vocals.wav",
-                            mime="audio/wav",
-                            key=f"download_no_vocals_{song_name}"
-                        )
+                    stem_path = f"{song_name}/no_vocals.wav"
+                    
+                    # Vorschau statt der großen WAV (lädt erst beim Abspielen)
+                    display_audio('stems', stem_path, 'audio/wav')
+                    
+                    # Download Button
+                    download_link("Download Instrumente", 'stems', stem_path)
                 else:
                     st.error("no_vocals.wav nicht gefunden")
             except Exception as e:
@@ -1377,10 +1603,111 @@ def display_vocals_only_section():
     except Exception as e:
         st.error(f"Fehler beim Laden der Vocals-Only Songs: {str(e)}")
 
+def stage_summary(events: List[Dict], window_s: float) -> List[Dict]:
+    """One table row per pipeline stage: volume, errors, latency percentiles and rate."""
+    rows = []
+    for stage in STAGES:
+        stage_events = [e for e in events if e['stage'] == stage]
+        if not stage_events:
+            continue
+        durations = [e['duration_s'] for e in stage_events if e['duration_s'] is not None]
+        row = {
+            "Stufe": STAGE_LABELS.get(stage, stage),
+            "Anzahl": len(stage_events),
+            "Fehler": sum(1 for e in stage_events if e['status'] == FAILED),
+            "pro Stunde": round(len(stage_events) * 3600 / window_s, 2),
+        }
+        if durations:
+            row["p50 (s)"] = round(percentile(durations, 0.5), 1)
+            row["p95 (s)"] = round(percentile(durations, 0.95), 1)
+            row["max (s)"] = round(max(durations), 1)
+        rows.append(row)
+    return rows
+
+def stage_throughput(events: List[Dict], since: float, bucket_s: float) -> tuple:
+    """Return (bucket start times, {stage label: finished units per bucket})."""
+    buckets = int((time.time() - since) // bucket_s) + 1
+    series: Dict[str, List[int]] = {}
+    for event in events:
+        label = STAGE_LABELS.get(event['stage'], event['stage'])
+        counts = series.setdefault(label, [0] * buckets)
+        counts[min(int((event['finished_at'] - since) // bucket_s), buckets - 1)] += 1
+    index = [datetime.fromtimestamp(since + i * bucket_s) for i in range(buckets)]
+    return index, series
+
+def mureka_step_summary() -> List[Dict]:
+    """Percentiles of the Mureka sub-steps from the histograms API.py keeps in metrics.json."""
+    rows = []
+    metrics = Metrics()  # frisch einlesen – geschrieben wird die Datei vom Job-Prozess
+    for name, (_, description) in HISTOGRAMS.items():
+        hist = metrics.histograms[name]
+        if not name.endswith("_seconds") or not hist.count:
+            continue
+        rows.append({
+            "Schritt": description,
+            "Anzahl": hist.count,
+            "p50 (s)": round(hist.quantile(0.5), 1),
+            "p95 (s)": round(hist.quantile(0.95), 1),
+            "Mittel (s)": round(hist.sum / hist.count, 1),
+        })
+    return rows
+
+@st.fragment(run_every=PIPELINE_REFRESH)
+def display_pipeline_stats(window: str) -> None:
+    """Live state counts and stage statistics; reads only the ledger, search index and metrics file."""
+    window_s, bucket_s = PIPELINE_WINDOWS[window]
+    since = time.time() - window_s
+    counts = get_ledger().state_counts()
+    index = get_search_index()
+    
+    st.markdown("#### Aktueller Stand")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Anfragen", index.count(f"{ACTIVE}/{ANFRAGEN}/"))
+    col2.metric("Songideen", index.count(f"{ACTIVE}/{SONGIDEEN}/"))
+    col3.metric("Archiv", index.count(f"{ARCHIVE}/"))
+    col4.metric("Mureka-Fehler", counts['jobs'].get(FAILED, 0))
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("An Mureka übergeben", counts['jobs'].get(SUBMITTED, 0))
+    col2.metric("Mureka generiert", counts['jobs'].get(POLLING, 0))
+    col3.metric("Wird heruntergeladen", counts['jobs'].get(DOWNLOADING, 0))
+    col4.metric("Songs fertig", counts['jobs'].get(DONE, 0))
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Warten auf Voice-Cloning", counts['handoff'].get(QUEUED, 0))
+    col2.metric("Voice-Cloning läuft", counts['handoff'].get(CLAIMED, 0))
+    col3.metric("Voice-Cloning fertig", counts['handoff'].get(DONE, 0))
+    col4.metric("Voice-Cloning-Fehler", counts['handoff'].get(FAILED, 0))
+    
+    events = get_ledger().stage_events(since)
+    st.markdown(f"#### Stufen – {window}")
+    if not events:
+        st.info("In diesem Zeitraum wurde keine Stufe abgeschlossen.")
+    else:
+        st.dataframe(pd.DataFrame(stage_summary(events, window_s)), hide_index=True, use_container_width=True)
+        st.markdown("#### Durchsatz")
+        bucket_index, series = stage_throughput(events, since, bucket_s)
+        st.bar_chart(pd.DataFrame(series, index=bucket_index))
+    
+    mureka_rows = mureka_step_summary()
+    if mureka_rows:
+        st.markdown("#### Mureka-Schritte (seit Beginn der Messung)")
+        st.dataframe(pd.DataFrame(mureka_rows), hide_index=True, use_container_width=True)
+    st.caption(f"Aktualisiert {datetime.now().strftime('%H:%M:%S')} · alle {PIPELINE_REFRESH} s")
+
+def display_pipeline_section():
+    """Display the operations view of the whole chain Anfrage → Songidee → Mureka → Voice-Cloning → Stems."""
+    st.title("Pipeline")
+    window = st.selectbox("Zeitraum", list(PIPELINE_WINDOWS), index=1, key="pipeline_window")
+    try:
+        display_pipeline_stats(window)
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Pipeline-Daten: {str(e)}")
+
 def main():
     """Main application."""
     try:
-        logger.info("Starting Streamlit application")
+        logger.debug("Starting Streamlit application")
         st.set_page_config(
             page_title="Anfragen Management",
             page_icon="📝",
@@ -1392,13 +1719,15 @@ def main():
         if os.path.exists(css_file_path):
             with open(css_file_path, 'r', encoding='utf-8') as f:
                 st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
-                logger.info(f"CSS file loaded: {css_file_path}")
+                logger.debug(f"CSS file loaded: {css_file_path}")
         
     except Exception as e:
         logger.error(f"Error during application startup: {str(e)}")
         pass
     
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(TABS)
+    ensure_media_server()
+    
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(TABS)
     
     with tab1:
         create_request_form()
@@ -1418,7 +1747,10 @@ def main():
     with tab6:
         display_vocals_only_section()
         
-    logger.info("Application shutdown")
+    with tab7:
+        display_pipeline_section()
+        
+    logger.debug("Application shutdown")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,157 @@
+# media_server.py
+# Liefert die Audiodateien (Songs, David-Style, Stems, Vorschauen) per HTTP an den Browser aus.
+# Tornados StaticFileHandler beantwortet Range-Requests: der Player lädt nur die
+# Teile, die er gerade abspielt, statt dass main.py ganze MP3s/WAVs über den
+# Streamlit-Websocket schickt.
+#
+#   python media_server.py             (eigener Prozess)
+#   main.py startet ihn sonst selbst in einem Hintergrund-Thread.
+#
+# Jede URL trägt eine befristete HMAC-Signatur (MEDIA_SECRET, sonst die
+# Datei .media_secret); ohne gültige Signatur antwortet der Server mit 403.
+# Deshalb lauscht er standardmäßig auf allen Adressen:
+#
+#   MEDIA_HOST=0.0.0.0                 (Standard; 127.0.0.1 = nur dieser Rechner,
+#                                       entfernte Browser sehen dann nur die Vorschauen)
+#   MEDIA_BASE_URL=https://host:8502   (optional; sonst Host der Streamlit-Seite + MEDIA_PORT)
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Dict
+from urllib.parse import quote
+
+import tornado.web
+
+from previews import PREVIEW_DIR
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MEDIA_HOST: str = os.getenv("MEDIA_HOST", "0.0.0.0")
+MEDIA_PORT: int = int(os.getenv("MEDIA_PORT", "8502"))
+# Adresse, unter der der Browser den Server erreicht; leer = aus der Streamlit-Anfrage ableiten
+MEDIA_BASE_URL: str = os.getenv("MEDIA_BASE_URL", "").rstrip("/")
+MEDIA_URL_TTL: int = int(os.getenv("MEDIA_URL_TTL", str(24 * 3600)))  # Gültigkeit einer URL in Sekunden
+SECRET_PATH: str = os.path.join(BASE_DIR, ".media_secret")
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+MEDIA_ROOTS: Dict[str, str] = {
+    "output": os.path.join(BASE_DIR, "output"),
+    "voicecloned": "/proj/voicecloned",
+    "stems": "/proj/separated/vocals_only/htdemucs",
+    "previews": str(PREVIEW_DIR),
+}
+
+
+_secret: bytes | None = None
+_secret_lock = threading.Lock()
+
+
+def _get_secret() -> bytes:
+    """Signing key shared by main.py and a separately started media server."""
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            value = os.getenv("MEDIA_SECRET")
+            if not value:
+                try:
+                    # O_EXCL: startet ein zweiter Prozess gleichzeitig, liest er die Datei des ersten
+                    fd = os.open(SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                except FileExistsError:
+                    while not value:  # der andere Prozess schreibt evtl. noch
+                        with open(SECRET_PATH, encoding="utf-8") as f:
+                            value = f.read().strip()
+                        if not value:
+                            time.sleep(0.05)
+                else:
+                    value = secrets.token_hex(32)
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        f.write(value)
+            _secret = value.encode()
+    return _secret
+
+
+def sign(path: str, expires: int) -> str:
+    """Signature for the URL path ``/<root>/<relative_path>`` valid until ``expires``."""
+    return hmac.new(_get_secret(), f"{path}|{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def is_local_bind(host: str = MEDIA_HOST) -> bool:
+    """Whether the server only accepts connections from this machine."""
+    return host in LOCAL_HOSTS
+
+
+class MediaHandler(tornado.web.StaticFileHandler):
+    """Static files behind a signed, expiring URL, with optional ``?download=1``."""
+
+    def prepare(self) -> None:
+        expires = self.get_argument("e", "")
+        token = self.get_argument("t", "")
+        if not expires.isdigit() or int(expires) < time.time():
+            raise tornado.web.HTTPError(403)
+        if not hmac.compare_digest(token, sign(self.request.path, int(expires))):
+            raise tornado.web.HTTPError(403)
+
+    def set_extra_headers(self, path: str) -> None:
+        if self.get_argument("download", None):
+            filename = quote(os.path.basename(path))
+            self.set_header("Content-Disposition", f"attachment; filename*=UTF-8''{filename}")
+
+
+def make_app() -> tornado.web.Application:
+    return tornado.web.Application(
+        [
+            (rf"/{name}/(.*)", MediaHandler, {"path": root})
+            for name, root in MEDIA_ROOTS.items()
+        ]
+    )
+
+
+def media_url(root: str, relative_path: str, base_url: str, download: bool = False) -> str:
+    """Signed URL of a file below ``MEDIA_ROOTS[root]``; the mtime busts stale browser caches.
+
+    The expiry is rounded to the hour so the URL, and with it the browser
+    cache entry, stays the same across reruns.
+    """
+    full_path = os.path.join(MEDIA_ROOTS[root], relative_path)
+    try:
+        version = int(os.path.getmtime(full_path))
+    except OSError:
+        version = 0
+    path = f"/{root}/{quote(relative_path)}"
+    expires = (int(time.time()) // 3600 + 1) * 3600 + MEDIA_URL_TTL
+    url = f"{base_url}{path}?v={version}&e={expires}&t={sign(path, expires)}"
+    return url + "&download=1" if download else url
+
+
+async def serve(host: str = MEDIA_HOST, port: int = MEDIA_PORT) -> None:
+    make_app().listen(port, address=host)
+    logger.info(f"Media server listening on {host}:{port}")
+    await asyncio.Event().wait()
+
+
+def start_in_background(host: str = MEDIA_HOST, port: int = MEDIA_PORT) -> threading.Thread:
+    """Run the server in a daemon thread with its own event loop."""
+
+    def run() -> None:
+        try:
+            asyncio.run(serve(host, port))
+        except OSError as exc:
+            # Port belegt: meist läuft der Server schon (zweiter Streamlit-Prozess)
+            logger.warning(f"Media server not started on port {port}: {exc}")
+
+    thread = threading.Thread(target=run, name="media-server", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
@@ -0,0 +1,279 @@
+# metrics.py
+# Strukturierte Laufzeitmessung pro Mureka-Job (Warteschlange, generate, Polling,
+# Download) mit aggregierten Histogrammen. Die Werte werden als JSON und im
+# Prometheus-Textformat geschrieben, damit Scraper und die Streamlit-App sie lesen können.
+# Watcher und Streamlit-Hintergrund-Jobs schreiben dieselbe Datei: jeder Prozess
+# sammelt nur seine neuen Werte und addiert sie unter einer Dateisperre auf den
+# aktuellen Dateiinhalt.
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from ledger import DONE, FAILED, get_ledger
+
+try:
+    import fcntl
+except ImportError:  # Windows: ohne Sperre, wie bisher
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Alle Prozesse mischen in dieselbe Datei, egal aus welchem Verzeichnis gestartet
+METRICS_PATH: Path = Path(os.getenv("MUREKA_METRICS", os.path.join(BASE_DIR, "metrics.json")))
+PROM_PATH: Path = METRICS_PATH.with_suffix(".prom")
+
+SECONDS_BUCKETS: Tuple[float, ...] = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 180, 300, 600, 1200)
+COUNT_BUCKETS: Tuple[float, ...] = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+BYTES_BUCKETS: Tuple[float, ...] = (1e5, 5e5, 1e6, 2e6, 5e6, 1e7, 2e7, 5e7)
+
+HISTOGRAMS: Dict[str, Tuple[Tuple[float, ...], str]] = {
+    "mureka_queue_wait_seconds": (SECONDS_BUCKETS, "Wait for a free job slot"),
+    "mureka_generate_seconds": (SECONDS_BUCKETS, "Latency of POST /song/generate"),
+    "mureka_first_running_seconds": (SECONDS_BUCKETS, "Submit until first 'running' status"),
+    "mureka_poll_seconds": (SECONDS_BUCKETS, "Submit until Mureka reports done"),
+    "mureka_polls_per_job": (COUNT_BUCKETS, "Status queries per job"),
+    "mureka_download_seconds": (SECONDS_BUCKETS, "MP3 download time"),
+    "mureka_download_bytes": (BYTES_BUCKETS, "MP3 size"),
+    "mureka_job_seconds": (SECONDS_BUCKETS, "End-to-end time per job"),
+}
+
+
+def percentile(values: Sequence[float], q: float) -> float | None:
+    """Nearest-rank percentile of raw values (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))]
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus sense (``le`` buckets)."""
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = tuple(bounds) + (math.inf,)
+        self.counts = [0] * len(self.bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate a quantile by linear interpolation inside the bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, previous = 0.0, 0
+        for bound, cumulative in zip(self.bounds, self.counts):
+            if cumulative >= rank:
+                if math.isinf(bound):
+                    return lower
+                share = (rank - previous) / max(cumulative - previous, 1)
+                return lower + (bound - lower) * share
+            lower, previous = bound, cumulative
+        return lower
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets": [[b if not math.isinf(b) else "+Inf", c] for b, c in zip(self.bounds, self.counts)],
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, bounds: Tuple[float, ...], data: Dict[str, Any]) -> "Histogram":
+        hist = cls(bounds)
+        counts = [c for _, c in data.get("buckets", [])]
+        if len(counts) == len(hist.counts):
+            hist.counts = counts
+            hist.sum = data.get("sum", 0.0)
+            hist.count = data.get("count", 0)
+        return hist
+
+
+class Metrics:
+    """Process-wide metric store; survives restarts by reloading its JSON file.
+
+    ``histograms``/``counters`` hold the file contents as of the last load or
+    flush plus this process's observations; the observations not yet written
+    are also kept in ``_pending_*`` so ``flush`` can add them to whatever
+    other processes wrote in the meantime.
+    """
+
+    def __init__(self, path: Path = METRICS_PATH) -> None:
+        self.path = path
+        self.prom_path = path.with_suffix(".prom")
+        self._lock = threading.Lock()
+        self.histograms, self.counters = self._read()
+        self._pending_histograms = self._empty_histograms()
+        self._pending_counters: Dict[str, int] = {}
+
+    @staticmethod
+    def _empty_histograms() -> Dict[str, Histogram]:
+        return {name: Histogram(bounds) for name, (bounds, _) in HISTOGRAMS.items()}
+
+    def _read(self) -> Tuple[Dict[str, Histogram], Dict[str, int]]:
+        histograms = self._empty_histograms()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return histograms, {}
+        for name, (bounds, _) in HISTOGRAMS.items():
+            if name in data.get("histograms", {}):
+                histograms[name] = Histogram.from_dict(bounds, data["histograms"][name])
+        return histograms, dict(data.get("counters", {}))
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self.histograms[name].observe(value)
+            self._pending_histograms[name].observe(value)
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            self._pending_counters[name] = self._pending_counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "updated_at": time.time(),
+            "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            "counters": dict(self.counters),
+        }
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            return self._prometheus_text()
+
+    def _prometheus_text(self) -> str:
+        lines: List[str] = []
+        for name, hist in self.histograms.items():
+            lines.append(f"# HELP {name} {HISTOGRAMS[name][1]}")
+            lines.append(f"# TYPE {name} histogram")
+            for bound, count in zip(hist.bounds, hist.counts):
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f'{name}_bucket{{le="{le}"}} {count}')
+            lines.append(f"{name}_sum {hist.sum}")
+            lines.append(f"{name}_count {hist.count}")
+        typed = set()
+        for key, value in sorted(self.counters.items()):
+            base = key.split("{", 1)[0]
+            if base not in typed:
+                lines.append(f"# TYPE {base} counter")
+                typed.add(base)
+            lines.append(f"{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        """Add the pending observations to the file contents and write both files.
+
+        Runs under an exclusive lock on ``<path>.lock`` so concurrent writers
+        in other processes are merged instead of overwritten; the files are
+        replaced atomically (tmp + rename).
+        """
+        with self._lock, open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            histograms, counters = self._read()
+            for name, pending in self._pending_histograms.items():
+                histograms[name].merge(pending)
+            for name, amount in self._pending_counters.items():
+                counters[name] = counters.get(name, 0) + amount
+            self.histograms, self.counters = histograms, counters
+            self._pending_histograms = self._empty_histograms()
+            self._pending_counters = {}
+            for target, text in (
+                (self.path, json.dumps(self._snapshot(), indent=2)),
+                (self.prom_path, self._prometheus_text()),
+            ):
+                tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+                tmp.write_text(text, encoding="utf-8")
+                os.replace(tmp, target)
+
+
+@dataclass
+class JobTiming:
+    """Timings of one job; ``None`` means the stage was not reached."""
+
+    job: str
+    queued_at: float = field(default_factory=time.monotonic)
+    queue_wait_s: float | None = None
+    generate_s: float | None = None
+    first_running_s: float | None = None
+    poll_s: float | None = None
+    polls: int = 0
+    download_s: float | None = None
+    download_bytes: int | None = None
+    total_s: float | None = None
+    status: str | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("queued_at")
+        return data
+
+
+_metrics: Metrics | None = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
+
+
+def record_job(timing: JobTiming, status: str) -> None:
+    """Feed a finished job into the histograms, log it and rewrite the metric files."""
+    timing.status = status
+    timing.total_s = time.monotonic() - timing.queued_at
+    metrics = get_metrics()
+    for name, value in (
+        ("mureka_queue_wait_seconds", timing.queue_wait_s),
+        ("mureka_generate_seconds", timing.generate_s),
+        ("mureka_first_running_seconds", timing.first_running_s),
+        ("mureka_poll_seconds", timing.poll_s),
+        ("mureka_polls_per_job", timing.polls or None),
+        ("mureka_download_seconds", timing.download_s),
+        ("mureka_download_bytes", timing.download_bytes),
+        ("mureka_job_seconds", timing.total_s),
+    ):
+        if value is not None:
+            metrics.observe(name, value)
+    metrics.inc(f'mureka_jobs_total{{status="{status}"}}')
+    logger.info(f"Job {timing.job} {status} after {timing.total_s:.1f}s", extra=timing.to_dict())
+    try:
+        # Verworfene Varianten sind kein abgeschlossener Durchlauf der Stufe
+        if status != "cancelled":
+            get_ledger().record_stage("mureka", FAILED if status == "failed" else DONE, timing.total_s)
+    except Exception as exc:  # Dashboard-Daten dürfen keinen Job scheitern lassen
+        logger.warning(f"Stage event not recorded: {exc}")
+    try:
+        metrics.flush()
+    except OSError as exc:
+        logger.error(f"Could not write metrics: {exc}")
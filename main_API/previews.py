@@ -0,0 +1,172 @@
+# previews.py
+# Vorschau-Dateien für fertige Songs und Stems: ein kurzes MP3 mit niedriger
+# Bitrate, ein Wellenform-PNG und eine JSON-Datei mit Dauer, Spitzenpegel und
+# Lautheit. API.py und voiceclone.py legen sie direkt nach dem Erzeugen einer
+# Datei an; main.py zeigt nur noch diese kleinen Dateien an.
+#
+#   python previews.py output/*.mp3      (nachträglich für vorhandene Dateien)
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PREVIEW_DIR: Path = Path(os.getenv("PREVIEW_DIR", os.path.join(BASE_DIR, "previews")))
+PREVIEW_SECONDS: int = 45
+PREVIEW_BITRATE: str = "64k"
+ANALYSIS_RATE: int = 22050  # Hz, reicht für Wellenform und Pegel
+WAVEFORM_SIZE: tuple = (800, 80)
+WAVEFORM_COLOR: tuple = (49, 51, 63, 255)
+
+
+def preview_key(source: Union[str, Path]) -> str:
+    """Stable file name stem for the previews of ``source`` (stems share names)."""
+    resolved = str(Path(source).resolve())
+    return f"{Path(source).stem}_{hashlib.sha1(resolved.encode('utf-8')).hexdigest()[:12]}"
+
+
+def sidecar_path(source: Union[str, Path]) -> Path:
+    return PREVIEW_DIR / f"{preview_key(source)}.json"
+
+
+def load_sidecar(source: Union[str, Path]) -> Dict[str, Any] | None:
+    """Return the sidecar of ``source`` if it exists and matches the file's mtime."""
+    try:
+        with open(sidecar_path(source), 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+        if sidecar.get("source_mtime") != int(os.path.getmtime(source)):
+            return None
+    except (OSError, ValueError):
+        return None
+    return sidecar
+
+
+def decode_mono(source: Union[str, Path]) -> np.ndarray:
+    """Decode ``source`` with ffmpeg to mono float32 samples at ANALYSIS_RATE."""
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-i", str(source),
+            "-ac", "1", "-ar", str(ANALYSIS_RATE), "-f", "f32le", "-",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def to_dbfs(value: float) -> float:
+    return round(20 * float(np.log10(max(value, 1e-9))), 1)
+
+
+def render_waveform(samples: np.ndarray, target: Path) -> None:
+    """Draw min/max per pixel column, like the usual DAW overview."""
+    width, height = WAVEFORM_SIZE
+    image = Image.new("RGBA", WAVEFORM_SIZE, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    if samples.size:
+        columns = np.array_split(samples, width)
+        middle = height / 2
+        for x, column in enumerate(columns):
+            if not column.size:
+                continue
+            top = middle - float(column.max()) * middle
+            bottom = middle - float(column.min()) * middle
+            draw.line([(x, top), (x, max(bottom, top + 1))], fill=WAVEFORM_COLOR)
+    part = target.with_name(target.name + ".part")
+    image.save(part, format="PNG", optimize=True)
+    os.replace(part, target)
+
+
+def encode_preview(source: Union[str, Path], target: Path) -> None:
+    part = target.with_name(target.name + ".part")
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y", "-i", str(source),
+            "-t", str(PREVIEW_SECONDS), "-ac", "1", "-b:a", PREVIEW_BITRATE,
+            "-f", "mp3", str(part),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    os.replace(part, target)
+
+
+def build_preview(source: Union[str, Path]) -> Dict[str, Any]:
+    """Write preview MP3, waveform PNG and sidecar JSON for ``source``; return the sidecar."""
+    source = Path(source)
+    PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+    key = preview_key(source)
+    samples = decode_mono(source)
+
+    render_waveform(samples, PREVIEW_DIR / f"{key}.png")
+    encode_preview(source, PREVIEW_DIR / f"{key}.mp3")
+
+    sidecar = {
+        "source": str(source.resolve()),
+        "source_mtime": int(source.stat().st_mtime),
+        "source_bytes": source.stat().st_size,
+        "duration_s": round(samples.size / ANALYSIS_RATE, 2),
+        "peak_dbfs": to_dbfs(float(np.abs(samples).max()) if samples.size else 0.0),
+        "rms_dbfs": to_dbfs(float(np.sqrt(np.mean(np.square(samples)))) if samples.size else 0.0),
+        "preview": f"{key}.mp3",
+        "waveform": f"{key}.png",
+    }
+    target = sidecar_path(source)
+    part = target.with_name(target.name + ".part")
+    part.write_text(json.dumps(sidecar, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(part, target)
+    logger.info(f"Preview for {source.name}: {sidecar['duration_s']}s, peak {sidecar['peak_dbfs']} dBFS")
+    return sidecar
+
+
+def ensure_preview(source: Union[str, Path]) -> Dict[str, Any] | None:
+    """Return an up-to-date sidecar, building it if needed; None if ffmpeg fails."""
+    sidecar = load_sidecar(source)
+    if sidecar is not None:
+        return sidecar
+    try:
+        return build_preview(source)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        logger.warning(f"No preview for {source}: {exc}")
+        return None
+
+
+def relocate_preview(old_source: Union[str, Path], new_source: Union[str, Path]) -> None:
+    """Carry the previews along when a file is moved (e.g. into output/archiv)."""
+    try:
+        with open(sidecar_path(old_source), 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return
+    old_key, new_key = preview_key(old_source), preview_key(new_source)
+    for suffix in (".mp3", ".png"):
+        old_file = PREVIEW_DIR / f"{old_key}{suffix}"
+        if old_file.exists():
+            os.replace(old_file, PREVIEW_DIR / f"{new_key}{suffix}")
+    sidecar.update(
+        {
+            "source": str(Path(new_source).resolve()),
+            "preview": f"{new_key}.mp3",
+            "waveform": f"{new_key}.png",
+        }
+    )
+    sidecar_path(new_source).write_text(json.dumps(sidecar, indent=2, ensure_ascii=False), encoding="utf-8")
+    sidecar_path(old_source).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for arg in sys.argv[1:]:
+        ensure_preview(arg)
@@ -0,0 +1,194 @@
+# search_index.py
+# Volltextsuche (SQLite FTS5) über Anfragen und Songideen in der Ablage (storage.py).
+# main.py und API.py aktualisieren den Index, sobald sie eine Datei schreiben;
+# sync() gleicht per mtime/Größe ab, was andere Prozesse abgelegt haben.
+# Dokumente sind über ihren Ablage-Schlüssel (storage.key_of) verknüpft, die
+# Spalte heißt aus Kompatibilität weiter "filename".
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from job_index import IndexEntry, first_record
+from storage import key_of
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Streamlit und Watcher teilen sich einen Index, egal aus welchem Verzeichnis gestartet
+SEARCH_INDEX_PATH: Path = Path(os.getenv("SOUNDBRANDING_SEARCH_INDEX", os.path.join(BASE_DIR, "search.sqlite3")))
+
+# Durchsuchte Felder mit ihrem Gewicht für das bm25-Ranking
+FIELDS: Dict[str, float] = {
+    "Firma": 10.0,
+    "Name": 5.0,
+    "Titel": 8.0,
+    "Songidee": 2.0,
+    "Lyrics": 1.0,
+    "Werte": 2.0,
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS documents (
+    id       INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    filename, {", ".join(FIELDS)},
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def match_expression(query: str) -> str:
+    """Turn free text into an FTS5 query: every word is a quoted prefix term."""
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", query))
+
+
+class SearchIndex:
+    """FTS5 index of the JSON files, keyed by their store key."""
+
+    def __init__(self, path: Union[str, Path] = SEARCH_INDEX_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._weights = ", ".join(["1.0", *(str(w) for w in FIELDS.values())])
+
+    def _delete(self, filename: str) -> None:
+        row = self._conn.execute(
+            "SELECT id FROM documents WHERE filename = ?", (filename,)
+        ).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+
+    def _insert(self, filename: str, mtime_ns: int, size: int, data: Any) -> None:
+        self._delete(filename)
+        record = first_record(data)
+        cursor = self._conn.execute(
+            "INSERT INTO documents (filename, mtime_ns, size) VALUES (?, ?, ?)",
+            (filename, mtime_ns, size),
+        )
+        values = [str(record.get(field) or "") for field in FIELDS]
+        self._conn.execute(
+            f"INSERT INTO documents_fts (rowid, filename, {', '.join(FIELDS)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in FIELDS)})",
+            (cursor.lastrowid, filename, *values),
+        )
+
+    def update_file(self, path: Union[str, Path]) -> None:
+        """(Re-)index one file; a missing or unreadable file is dropped from the index."""
+        self.update_files([path])
+
+    def update_files(self, paths: List[Union[str, Path]], removed: List[str] = ()) -> None:
+        """(Re-)index several files and drop the ``removed`` keys in one transaction.
+
+        Missing or unreadable files are dropped from the index as well.
+        """
+        documents = []
+        removed = list(removed)
+        for path in paths:
+            try:
+                st = os.stat(path)
+                with open(path, 'r', encoding='utf-8') as f:
+                    documents.append((key_of(path), st.st_mtime_ns, st.st_size, json.load(f)))
+            except (OSError, ValueError):
+                removed.append(key_of(path))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for filename in removed:
+                self._delete(filename)
+            for document in documents:
+                self._insert(*document)
+            self._conn.execute("COMMIT")
+
+    def remove(self, filename: str) -> None:
+        self.update_files([], [filename])
+
+    def sync(self, entries: Dict[str, IndexEntry], scope: str = "") -> int:
+        """Bring the index in line with a ``JsonIndex.scan()`` result.
+
+        Only files whose mtime or size differ from the indexed version are
+        written; indexed keys below ``scope`` (e.g. ``aktiv/songideen/``) that
+        are not in ``entries`` are removed. Returns the number of changes.
+        """
+        current = {key_of(path): entry for path, entry in entries.items()}
+        changes = 0
+        with self._lock:
+            known = {
+                filename: (mtime_ns, size)
+                for filename, mtime_ns, size in self._conn.execute(
+                    "SELECT filename, mtime_ns, size FROM documents WHERE substr(filename, 1, ?) = ?",
+                    (len(scope), scope),
+                )
+            }
+            stale = [
+                (filename, entry)
+                for filename, entry in current.items()
+                if known.get(filename) != (entry.mtime_ns, entry.size)
+            ]
+            removed = [filename for filename in known if filename not in current]
+            if not stale and not removed:
+                return 0
+            self._conn.execute("BEGIN")
+            for filename, entry in stale:
+                if entry.error is None:
+                    self._insert(filename, entry.mtime_ns, entry.size, entry.data)
+                else:
+                    self._delete(filename)
+                changes += 1
+            for filename in removed:
+                self._delete(filename)
+                changes += 1
+            self._conn.execute("COMMIT")
+        logger.info(f"Search index synced ({changes} changes)")
+        return changes
+
+    def search(self, query: str, prefix: str = "", limit: int = 1000) -> List[str]:
+        """Return the keys of matching files below ``prefix``, best match first."""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT d.filename FROM documents_fts f JOIN documents d ON d.id = f.rowid "
+                f"WHERE documents_fts MATCH ? AND substr(d.filename, 1, ?) = ? "
+                f"ORDER BY bm25(documents_fts, {self._weights}) LIMIT ?",
+                (expression, len(prefix), prefix, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, prefix: str = "") -> int:
+        """Number of indexed files below ``prefix`` (e.g. ``aktiv/anfragen/``)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM documents WHERE substr(filename, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchone()
+        return row[0]
+
+
+_index: SearchIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Return the process-wide search index, opening it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex()
+    return _index
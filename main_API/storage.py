@@ -0,0 +1,193 @@
+# storage.py
+# Ablage der Anfragen und Songideen, aufgeteilt nach Bestand, Typ und Kunde:
+#
+#   ablage/aktiv/anfragen/<firma>/Anfr_….json
+#   ablage/aktiv/songideen/<firma>/Song_….json
+#   ablage/archiv/anfragen/<firma>/…          (archivierte Einträge)
+#
+# Die aktiven Listen lesen nur ablage/aktiv/<typ>/, egal wie groß das Archiv
+# wird. files/ bleibt der Eingang für neue Dateien (n8n, Benchmark, Hand):
+# ingest() sortiert sie ein, der Watcher und main.py rufen es laufend auf.
+#
+#   python storage.py --dry-run        (zeigt, was die Migration verschieben würde)
+#   python storage.py                  (verschiebt files/*.json einmalig in die Ablage)
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, List, Tuple, Union
+
+from job_index import JsonIndex, first_record
+from ledger import DONE, get_ledger
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR: Path = Path(os.getenv("SOUNDBRANDING_STORE", os.path.join(BASE_DIR, "ablage")))
+INBOX_DIR: Path = Path(os.getenv("SOUNDBRANDING_INBOX", os.path.join(BASE_DIR, "files")))
+_STORE_PREFIX = str(STORE_DIR) + os.sep
+
+ACTIVE = "aktiv"
+ARCHIVE = "archiv"
+ANFRAGEN = "anfragen"
+SONGIDEEN = "songideen"
+OTHER = "sonstige"  # JSON-Dateien ohne bekanntes Präfix (werden trotzdem verarbeitet)
+KIND_PREFIXES = {"Anfr_": ANFRAGEN, "Song_": SONGIDEEN}
+ARCHIVE_PREFIX = "Archiv_"  # alte Kennzeichnung archivierter Dateien in files/
+NO_CUSTOMER = "_ohne_firma"
+INGEST_GRACE: float = 5.0  # Sekunden, die eine unlesbare Datei im Eingang noch fertig werden darf
+
+
+def classify(filename: str) -> Tuple[str, str]:
+    """Return (tier, kind) for a file name from the flat files/ layout."""
+    tier = ACTIVE
+    if filename.startswith(ARCHIVE_PREFIX):
+        tier, filename = ARCHIVE, filename[len(ARCHIVE_PREFIX):]
+    for prefix, kind in KIND_PREFIXES.items():
+        if filename.startswith(prefix):
+            return tier, kind
+    return tier, OTHER
+
+
+def customer_of(data: Any) -> str:
+    """Directory name for the customer (Firma) of a request or Songidee."""
+    firma = str(first_record(data).get("Firma") or "").strip().lower()
+    return re.sub(r"[^\w-]+", "_", firma).strip("_") or NO_CUSTOMER
+
+
+def partition(tier: str, kind: str) -> Path:
+    return STORE_DIR / tier / kind
+
+
+def key_of(path: Union[str, Path]) -> str:
+    """Store-relative key like ``aktiv/songideen/acme/Song_x.json``."""
+    path = str(path)
+    if path.startswith(_STORE_PREFIX):  # Pfade aus den Partition-Indizes, ohne relpath()
+        return path[len(_STORE_PREFIX):].replace(os.sep, "/")
+    return Path(os.path.relpath(path, STORE_DIR)).as_posix()
+
+
+def path_of(key: str) -> Path:
+    return STORE_DIR / key
+
+
+def split_key(key: str) -> Tuple[str, str]:
+    """Return (tier, kind) of a store key."""
+    tier, kind = key.split("/", 2)[:2]
+    return tier, kind
+
+
+def partition_index(tier: str, kind: str) -> JsonIndex:
+    """JsonIndex over one partition (all customers)."""
+    return JsonIndex(partition(tier, kind), recursive=True)
+
+
+def _free_path(target: Path) -> Path:
+    """``target`` or, if taken, the first ``name_N.json`` next to it that is not."""
+    candidate, n = target, 1
+    while candidate.exists():
+        candidate = target.with_name(f"{target.stem}_{n}{target.suffix}")
+        n += 1
+    return candidate
+
+
+def _move(source: Path, target: Path) -> Path:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target = _free_path(target)
+    os.rename(source, target)
+    # Laufende oder fertige Jobs sind im Ledger über den Dateipfad verknüpft
+    get_ledger().relocate(source, target)
+    return target
+
+
+def new_path(kind: str, data: Any, filename: str) -> Path:
+    """Where a new file of ``kind`` for ``data``'s customer is to be written."""
+    target = partition(ACTIVE, kind) / customer_of(data) / filename
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return _free_path(target)
+
+
+def move_to(path: Union[str, Path], tier: str) -> Path:
+    """Move a stored file to ``tier`` (archive/restore); type and customer stay the same."""
+    path = Path(path)
+    _, kind, customer = key_of(path).split("/")[:3]
+    target = _move(path, partition(tier, kind) / customer / path.name)
+    logger.info(f"Moved {key_of(path)} to {key_of(target)}")
+    return target
+
+
+def ingest(inbox: Union[str, Path] = INBOX_DIR, grace: float = INGEST_GRACE) -> List[Path]:
+    """Sort the JSON files in the flat inbox into the store; return their new paths.
+
+    Files that cannot be parsed yet are left alone for ``grace`` seconds (they
+    may still be written); after that they are stored under NO_CUSTOMER so the
+    usual error handling sees them.
+    """
+    inbox = Path(inbox)
+    if not inbox.is_dir():
+        return []
+    moved = []
+    with os.scandir(inbox) as it:
+        entries = [d for d in it if d.name.endswith(".json") and d.is_file()]
+    for dirent in entries:
+        try:
+            with open(dirent.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            if time.time() - dirent.stat().st_mtime < grace:
+                continue
+            data = None
+        except FileNotFoundError:
+            continue  # ein anderer Prozess war schneller
+        tier, kind = classify(dirent.name)
+        name = dirent.name[len(ARCHIVE_PREFIX):] if tier == ARCHIVE else dirent.name
+        try:
+            target = _move(Path(dirent.path), partition(tier, kind) / customer_of(data) / name)
+        except FileNotFoundError:
+            continue
+        logger.info(f"Ingested {dirent.name} as {key_of(target)}")
+        if kind == SONGIDEEN and tier == ACTIVE:
+            get_ledger().record_stage("songidee", DONE)
+        moved.append(target)
+    if moved:
+        # Suchindex sofort nachführen, damit Suche und Pipeline-Zähler die Dateien kennen
+        from search_index import get_search_index
+        get_search_index().update_files(moved)
+    return moved
+
+
+def migrate(inbox: Union[str, Path] = INBOX_DIR, dry_run: bool = False) -> int:
+    """One-shot move of the flat files/ directory into the store."""
+    inbox = Path(inbox)
+    names = sorted(p.name for p in inbox.glob("*.json"))
+    for name in names:
+        tier, kind = classify(name)
+        print(f"{name}  →  {tier}/{kind}/")
+    if dry_run or not names:
+        return len(names)
+
+    moved = ingest(inbox, grace=0)
+    # Suchindex von Dateinamen auf Ablage-Schlüssel umstellen
+    from search_index import get_search_index
+    entries = {}
+    for tier in (ACTIVE, ARCHIVE):
+        for kind in (ANFRAGEN, SONGIDEEN, OTHER):
+            entries.update(partition_index(tier, kind).scan())
+    get_search_index().sync(entries)
+    print(f"{len(moved)} von {len(names)} Dateien nach {STORE_DIR} verschoben")
+    return len(moved)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="files/ in die Ablage (aktiv/archiv, Typ, Kunde) überführen")
+    parser.add_argument("--inbox", default=str(INBOX_DIR))
+    parser.add_argument("--dry-run", action="store_true", help="nur anzeigen, nichts verschieben")
+    args = parser.parse_args()
+    migrate(args.inbox, args.dry_run)
@@ -0,0 +1,298 @@
+# transport.py
+# Gemeinsame HTTP-Schicht für alle Mureka-Aufrufe (API.py und die Clients in Alt/).
+# Eine Session mit Keep-Alive-Pool, Timeouts pro Route, Token-Buckets gegen die
+# Rate-Limits des Providers und begrenzten Retries mit Jitter für Aufrufe,
+# die gefahrlos wiederholt werden können.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# ──────────────────────────────────────────────────────────────
+# Konfiguration
+# ──────────────────────────────────────────────────────────────
+POOL_SIZE: int = int(os.getenv("MUREKA_POOL_SIZE", "20"))
+MAX_RETRIES: int = int(os.getenv("MUREKA_MAX_RETRIES", "3"))
+BACKOFF_BASE: float = 0.5  # Sekunden, verdoppelt sich pro Versuch
+BACKOFF_MAX: float = 8.0
+RETRY_STATUS: set[int] = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS: set[str] = {"GET", "HEAD", "OPTIONS"}
+
+# (connect, read) in Sekunden; der längste passende Präfix gewinnt.
+DEFAULT_TIMEOUT: Tuple[float, float] = (5, 120)
+ROUTE_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "/song/generate": (5, 60),
+    "/song/query": (5, 15),
+    "/song/stem": (5, 60),
+    "/uploads": (5, 300),
+    "/finetuning": (5, 30),
+    "download": (5, 120),
+}
+
+# Token-Bucket pro Route: (Anfragen pro Minute, Burst). Überschreibbar per env;
+# X-RateLimit-Remaining/-Reset und Retry-After des Providers bremsen zusätzlich.
+RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "/song/generate": (
+        float(os.getenv("MUREKA_GENERATE_PER_MIN", "10")),
+        int(os.getenv("MUREKA_GENERATE_BURST", "3")),
+    ),
+    "/song/": (
+        float(os.getenv("MUREKA_REQUESTS_PER_MIN", "300")),
+        int(os.getenv("MUREKA_REQUESTS_BURST", "20")),
+    ),
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a request may go out."""
+
+    def __init__(self, per_minute: float, burst: int) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take one token if available and return 0, else return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return max(self._paused_until - now, (1 - self._tokens) / self.rate)
+
+    def acquire(self) -> float:
+        """Take one token, sleeping as long as necessary. Returns the time waited."""
+        waited = 0.0
+        while (delay := self.try_acquire()) > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self) -> float:
+        """Like ``acquire``, but waits on the event loop instead of blocking a thread."""
+        waited = 0.0
+        while (delay := self.try_acquire()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (e.g. after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def update_from_headers(self, headers: Any) -> None:
+        """Follow the provider's X-RateLimit-Remaining/-Reset headers if present."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None or not remaining.isdigit():
+            return
+        with self._lock:
+            self._tokens = min(self._tokens, float(remaining))
+        reset = _reset_seconds(headers.get("X-RateLimit-Reset"))
+        if remaining == "0" and reset:
+            self.pause(reset)
+
+
+def _reset_seconds(reset: str | None) -> float | None:
+    """X-RateLimit-Reset may be seconds-until-reset or an epoch timestamp."""
+    try:
+        value = float(reset) if reset else None
+    except ValueError:
+        return None
+    if value is not None and value > 86400:
+        value -= time.time()
+    return max(value, 0.0) if value is not None else None
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(route: str | None) -> TokenBucket | None:
+    """Return the shared bucket for ``route`` (longest matching prefix)."""
+    if not route:
+        return None
+    matches = [prefix for prefix in RATE_LIMITS if route.startswith(prefix)]
+    if not matches:
+        return None
+    prefix = max(matches, key=len)
+    with _buckets_lock:
+        if prefix not in _buckets:
+            _buckets[prefix] = TokenBucket(*RATE_LIMITS[prefix])
+        return _buckets[prefix]
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def timeout_for(route: str | None) -> Tuple[float, float]:
+    if not route:
+        return DEFAULT_TIMEOUT
+    matches = [prefix for prefix in ROUTE_TIMEOUTS if route.startswith(prefix)]
+    if not matches:
+        return DEFAULT_TIMEOUT
+    return ROUTE_TIMEOUTS[max(matches, key=len)]
+
+
+def backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After if given."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX * 4)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _body_streams(kwargs: Dict[str, Any]) -> List[Any]:
+    """File objects (or generators) in ``files=``/``data=`` that sending the request consumes."""
+    streams = []
+    files = kwargs.get("files") or {}
+    for value in files.values() if isinstance(files, dict) else (item[1] for item in files):
+        if isinstance(value, (tuple, list)):
+            value = value[1]  # (filename, fileobj[, content_type[, headers]])
+        if hasattr(value, "read"):
+            streams.append(value)
+    data = kwargs.get("data")
+    if data is not None and not isinstance(data, (str, bytes, bytearray, dict, list, tuple)):
+        streams.append(data)
+    return streams
+
+
+def _stream_positions(streams: List[Any]) -> List[int] | None:
+    """Start offsets to rewind ``streams`` to before a retry, or None if one can't be rewound."""
+    try:
+        if not all(stream.seekable() for stream in streams):
+            return None
+        return [stream.tell() for stream in streams]
+    except (AttributeError, OSError):
+        return None
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    route: str | None = None,
+    idempotent: bool | None = None,
+    retries: int = MAX_RETRIES,
+    token_taken: bool = False,
+    **kwargs: Any,
+) -> requests.Response:
+    """Send a request through the shared session.
+
+    Args:
+        method: HTTP method
+        url: Full URL
+        route: Route key used to pick timeout and rate limit (e.g. ``/song/query``)
+        idempotent: Whether the call may be repeated; defaults to True for GET/HEAD
+        retries: Maximum number of additional attempts. A body read from
+            file objects is rewound for every retry; if it can't be
+            rewound, the call is not retried.
+        token_taken: The caller already took the rate-limit token for the
+            first attempt (see ``TokenBucket.acquire_async``)
+        **kwargs: Passed on to ``requests.Session.request``
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    kwargs.setdefault("timeout", timeout_for(route))
+    session = get_session()
+    bucket = bucket_for(route)
+    streams = _body_streams(kwargs)
+    positions = _stream_positions(streams)
+    if positions is None:
+        retries = 0
+
+    attempt = 0
+    while True:
+        if attempt and streams:
+            for stream, position in zip(streams, positions):
+                stream.seek(position)
+        if bucket is not None and not (token_taken and attempt == 0):
+            waited = bucket.acquire()
+            if waited > 1:
+                logger.info(f"Rate limit: {method} {route} waited {waited:.1f}s for a token")
+        try:
+            resp = session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectTimeout as exc:
+            # Die Verbindung kam nie zustande – auch POSTs dürfen wiederholt werden.
+            error = exc
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+            if not idempotent:
+                raise
+            error = exc
+        else:
+            if bucket is not None:
+                bucket.update_from_headers(resp.headers)
+            delay = backoff_delay(attempt, resp.headers.get("Retry-After"))
+            if resp.status_code == 429 and bucket is not None:
+                # Alle Threads auf dieser Route pausieren, nicht nur dieser.
+                bucket.pause(delay)
+            if resp.status_code not in RETRY_STATUS or attempt >= retries:
+                return resp
+            # 429 heißt "nicht angenommen" und ist daher immer wiederholbar.
+            if not idempotent and resp.status_code != 429:
+                return resp
+            logger.warning(
+                f"{method} {route or url} → {resp.status_code}, retry {attempt + 1}/{retries} in {delay:.1f}s"
+            )
+            resp.close()
+            if resp.status_code != 429 or bucket is None:
+                time.sleep(delay)
+            attempt += 1
+            continue
+
+        if attempt >= retries:
+            raise error
+        delay = backoff_delay(attempt)
+        logger.warning(
+            f"{method} {route or url} failed ({error}), retry {attempt + 1}/{retries} in {delay:.1f}s"
+        )
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(url: str, *, route: str | None = None, **kwargs: Any) -> requests.Response:
+    return request("GET", url, route=route, **kwargs)
+
+
+def post(url: str, *, route: str | None = None, **kwargs: Any) -> requests.Response:
+    return request("POST", url, route=route, **kwargs)